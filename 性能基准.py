@@ -0,0 +1,226 @@
+"""性能基准：在本地模拟教务系统上运行脚本，报告总耗时、各阶段耗时、WebDriver命令数、传输字节数和内存峰值，
+用于比较不同执行引擎和发现性能退化
+
+用法: python 性能基准.py --engine process tab http --courses 10 --interval 5 --latency 0.05
+      python 性能基准.py --engine process --lean both  # 比较精简浏览器模式节省的流量和内存
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+
+import 教评脚本2 as evaluation_script
+import 模拟教务服务器 as mock_server
+
+
+class MemorySampler(threading.Thread):
+    """后台定期采样进程树的内存占用"""
+
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.samples.append(evaluation_script.process_tree_rss(os.getpid()))
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    @property
+    def peak(self):
+        return max(self.samples, default=0)
+
+    @property
+    def average(self):
+        return sum(self.samples) / len(self.samples) if self.samples else 0
+
+
+def run_benchmark(engine, args, lean=False):
+    """在新的模拟服务器上用指定引擎跑一遍完整流程，返回指标；lean为True时使用精简浏览器模式"""
+    server, state = mock_server.make_server(
+        0, course_count=args.courses, mandatory_interval=args.interval,
+        question_count=args.questions, latency=args.latency, account_count=args.accounts,
+        failure_rate=args.failure_rate, lost_rate=args.lost_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    config = {
+        'engine': engine,
+        'lean_browser': lean,
+        'base_url': f"http://127.0.0.1:{server.server_address[1]}",
+        'headless': True,
+        'fill_wait_seconds': args.interval + 0.5,
+        'launch_interval': args.launch_interval,
+        'pool_size': args.pool_size,
+        'max_tabs': args.pool_size,
+        'batch_max_sessions': args.pool_size,
+        'adaptive': args.adaptive,
+        'profile': True,
+        'profile_events_path': args.events,
+    }
+    bots = []
+    governor = None
+    policy = None
+    sampler = MemorySampler()
+    output = sys.stdout if args.verbose else open(os.devnull, 'w', encoding='utf-8')
+
+    sampler.start()
+    start_time = time.time()
+    try:
+        with contextlib.redirect_stdout(output):
+            if args.accounts > 1:
+                runner = evaluation_script.BatchEvaluationRunner(
+                    [(account, state.password) for account in state.accounts], config)
+                bots = runner.bots.values()
+                governor = runner.memory_governor
+                policy = runner.policy
+                runner.run()
+            else:
+                bots = [evaluation_script.TeachingEvaluationBot(config)]
+                governor = bots[0].memory_governor
+                bots[0].run(state.student_id, state.password)
+                policy = bots[0].launch_policy
+    finally:
+        wall_time = time.time() - start_time
+        sampler.stop()
+        server.shutdown()
+        server.server_close()
+        if output is not sys.stdout:
+            output.close()
+
+    # 阶段耗时和命令统计来自脚本自带的性能分析层，"http "开头的是HTTP引擎的请求
+    phases = {}
+    command_counts = {}
+    for bot in bots:
+        for phase, durations in bot.profiler.phase_stats.items():
+            phases.setdefault(phase, []).extend(durations)
+        for (_, command), durations in bot.profiler.command_stats.items():
+            if not command.startswith('http '):
+                command_counts[command] = command_counts.get(command, 0) + len(durations)
+    return {
+        'engine': engine,
+        'lean_browser': lean,
+        'accounts': args.accounts,
+        'courses': args.courses * args.accounts,
+        'evaluated': state.evaluated_count(),
+        'rejections': len(state.rejections),
+        'injected_failures': state.injected_failures,
+        'lost_submissions': state.lost_submissions,
+        # 脚本核对评估列表后认为已评估的课程数，应与服务器记录的evaluated一致
+        'reported_evaluated': sum(bot.count_evaluated() for bot in bots),
+        'retries': {stage: sum(bot.retry.retries.get(stage, 0) for bot in bots)
+                    for stage in sorted({stage for bot in bots for stage in bot.retry.retries})},
+        'wall_time': wall_time,
+        'phases': {
+            phase: {'count': len(durations), 'avg': sum(durations) / len(durations), 'max': max(durations)}
+            for phase, durations in phases.items()
+        },
+        'webdriver_commands': sum(command_counts.values()),
+        'webdriver_command_counts': dict(sorted(command_counts.items(), key=lambda item: -item[1])),
+        'http_requests': sum(state.request_counts.values()),
+        'bytes_sent': state.bytes_sent,
+        'peak_rss_mb': sampler.peak / 1024 / 1024,
+        'avg_rss_mb': sampler.average / 1024 / 1024,
+        # 内存调度按会话采样的浏览器内存，http引擎没有
+        'session_rss_mb': session_memory(governor),
+        # 自适应调度每次调整后的(距开始秒数, 并发, 启动间隔)
+        'adaptive_decisions': [(round(when - policy.started, 1), in_flight, round(interval, 2))
+                               for when, in_flight, interval in getattr(policy, 'decisions', [])],
+    }
+
+
+def session_memory(governor):
+    """汇总内存调度记录的每个会话的内存峰值和平均值（MB）"""
+    if not governor or not governor.session_samples:
+        return None
+    samples = governor.session_samples.values()
+    return {
+        'sessions': len(samples),
+        'peak': max(max(values) for values in samples) / 1024 / 1024,
+        'avg': sum(sum(values) / len(values) for values in samples) / len(samples) / 1024 / 1024,
+        'deferred_launches': governor.deferred,
+    }
+
+
+def print_lean_savings(normal, lean):
+    """打印精简浏览器模式相对普通模式节省的流量和内存"""
+    saved_bytes = normal['bytes_sent'] - lean['bytes_sent']
+    saved_rss = normal['peak_rss_mb'] - lean['peak_rss_mb']
+    ratio = saved_bytes / normal['bytes_sent'] if normal['bytes_sent'] else 0
+    print(f"\n精简浏览器模式节省 ({normal['engine']}): 传输 {saved_bytes / 1024:.1f} KB ({ratio:.0%}), "
+          f"内存峰值 {saved_rss:.1f} MB, 耗时 {normal['wall_time'] - lean['wall_time']:.2f} 秒")
+
+
+def print_report(result):
+    """打印单个引擎的基准结果"""
+    mode = " (精简浏览器)" if result['lean_browser'] else ""
+    print(f"\n===== 引擎: {result['engine']}{mode} =====")
+    print(f"完成评估: {result['evaluated']}/{result['courses']}, 被拒绝的提交: {result['rejections']}")
+    if result['lost_submissions'] or result['reported_evaluated'] != result['evaluated']:
+        print(f"未生效的提交: {result['lost_submissions']} 次, 脚本报告已评估: {result['reported_evaluated']}")
+    print(f"总耗时: {result['wall_time']:.2f} 秒")
+    if result['injected_failures'] or result['retries']:
+        retries = ", ".join(f"{stage} {count}" for stage, count in result['retries'].items()) or "无"
+        print(f"注入的服务器错误: {result['injected_failures']} 次, 重试: {retries}")
+    print(f"WebDriver命令: {result['webdriver_commands']} 次, 服务器请求: {result['http_requests']} 次, "
+          f"传输: {result['bytes_sent'] / 1024:.1f} KB")
+    print(f"内存峰值: {result['peak_rss_mb']:.1f} MB, 平均: {result['avg_rss_mb']:.1f} MB")
+    if result['session_rss_mb']:
+        memory = result['session_rss_mb']
+        print(f"每个会话的浏览器内存: 峰值 {memory['peak']:.1f} MB, 平均 {memory['avg']:.1f} MB "
+              f"（{memory['sessions']} 个会话），因内存不足推迟启动 {memory['deferred_launches']} 次")
+    print(f"{'阶段':<14} {'次数':>4} {'平均(秒)':>8} {'最长(秒)':>8}")
+    for phase, stats in result['phases'].items():
+        print(f"{phase:<14} {stats['count']:>4} {stats['avg']:>8.3f} {stats['max']:>8.3f}")
+    if result['adaptive_decisions']:
+        print("自适应调度: " + " → ".join(f"{when:.0f}秒 并发{in_flight}/间隔{interval}秒"
+                                          for when, in_flight, interval in result['adaptive_decisions']))
+    top_commands = list(result['webdriver_command_counts'].items())[:8]
+    if top_commands:
+        print("最常用的WebDriver命令: " + ", ".join(f"{name} {count}" for name, count in top_commands))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在本地模拟教务系统上做性能基准")
+    parser.add_argument('--engine', nargs='+', default=['http'], choices=['process', 'tab', 'http'])
+    parser.add_argument('--courses', type=int, default=10, help="课程数量")
+    parser.add_argument('--interval', type=float, default=5, help="模拟服务器要求的填写到提交间隔（秒）")
+    parser.add_argument('--questions', type=int, default=10, help="每份问卷的问题数")
+    parser.add_argument('--latency', type=float, default=0.05, help="每个请求额外的响应延迟（秒）")
+    parser.add_argument('--launch-interval', type=float, default=0.5, help="相邻评估会话的启动间隔（秒）")
+    parser.add_argument('--pool-size', type=int, default=5, help="同时使用的浏览器或标签页数量")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="模拟服务器随机返回503的比例")
+    parser.add_argument('--lost-rate', type=float, default=0.0, help="模拟服务器返回成功但没有记录提交的比例")
+    parser.add_argument('--lean', choices=['off', 'on', 'both'], default='off',
+                        help="精简浏览器模式；both时每个浏览器引擎各跑一遍并比较节省的流量和内存")
+    parser.add_argument('--adaptive', action='store_true', help="开启自适应并发和启动间隔")
+    parser.add_argument('--accounts', type=int, default=1, help="账号数量，大于1时使用批量模式")
+    parser.add_argument('--json', help="把结果写入JSON文件")
+    parser.add_argument('--events', help="把每条命令和每个阶段的性能事件写入JSON Lines文件")
+    parser.add_argument('--verbose', action='store_true', help="显示脚本自身的输出")
+    args = parser.parse_args()
+
+    results = []
+    lean_modes = {'off': [False], 'on': [True], 'both': [False, True]}[args.lean]
+    for engine in args.engine:
+        engine_results = []
+        # http引擎不启动浏览器，精简模式对它没有意义
+        for lean in (lean_modes if engine != 'http' else [False]):
+            result = run_benchmark(engine, args, lean)
+            print_report(result)
+            engine_results.append(result)
+        if len(engine_results) == 2:
+            print_lean_savings(*engine_results)
+        results.extend(engine_results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json}")
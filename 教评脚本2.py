@@ -1,93 +1,2510 @@
+import os
+import re
+import queue
+import atexit
+import signal
+import tempfile
+import subprocess
+import ssl
+import json
 import time
+import hashlib
+import heapq
+import itertools
 import threading
+import contextlib
+import collections
+import http.client
+import http.cookiejar
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
 from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 教务系统页面路径
+LOGIN_PATH = "/index.jsp"
+EVALUATION_INDEX_PATH = "/student/teachingEvaluation/evaluation/index"
+
+# 主观评价文本
+EVALUATION_TEXT = "老师教学认真负责，课程内容充实，受益匪浅。"
+
+# 一次性读取评估列表：返回每行的课程、教师、状态和评估按钮信息
+COURSE_TABLE_SCRIPT = """
+var rows = document.querySelectorAll('#jxpgtbody > tr');
+var result = [];
+for (var i = 0; i < rows.length; i++) {
+    var cells = rows[i].children;
+    var text = function (cell) { return cell ? cell.innerText.trim() : ''; };
+    var button = cells[0] ? cells[0].querySelector('button') : null;
+    result.push({
+        row: i,
+        teacher: text(cells[2]),
+        course_name: text(cells[3]),
+        status: text(cells[4]),
+        button_id: button ? button.id : '',
+        onclick: button ? (button.getAttribute('onclick') || '') : ''
+    });
+}
+return result;
+"""
+
+# 校验指定行的课程和教师后点击该行的评估按钮，不匹配时返回false
+CLICK_COURSE_BUTTON_SCRIPT = """
+var row = document.querySelectorAll('#jxpgtbody > tr')[arguments[0]];
+if (!row) { return false; }
+var cells = row.children;
+if (!cells[3] || cells[3].innerText.trim() !== arguments[1] ||
+        !cells[2] || cells[2].innerText.trim() !== arguments[2]) {
+    return false;
+}
+var button = cells[0].querySelector('button');
+if (!button) { return false; }
+button.click();
+return true;
+"""
+
+# 直接打开问卷：按解析评估列表时得到的问卷地址和参数构造表单提交，不必加载评估列表页再点击按钮；
+# arguments[3]为目标窗口名，"_blank"时在新标签页中打开
+OPEN_TARGET_SCRIPT = """
+var form = document.createElement('form');
+form.method = arguments[1];
+form.action = arguments[0];
+form.target = arguments[3] || '_self';
+form.style.display = 'none';
+var params = arguments[2] || {};
+for (var name in params) {
+    var input = document.createElement('input');
+    input.type = 'hidden';
+    input.name = name;
+    input.value = params[name];
+    form.appendChild(input);
+}
+document.body.appendChild(form);
+HTMLFormElement.prototype.submit.call(form);
+if (form.target !== '_self') { form.parentNode.removeChild(form); }
+return true;
+"""
+
+# 校验直接打开的问卷属于指定课程：页面文本（忽略空白）中同时出现课程名和教师名
+QUESTIONNAIRE_MATCHES_SCRIPT = """
+var squash = function (value) { return (value || '').replace(/\\s+/g, ''); };
+var text = squash(document.body ? document.body.innerText : '');
+return text.indexOf(squash(arguments[0])) >= 0 && text.indexOf(squash(arguments[1])) >= 0;
+"""
+
+# 一次性填写问卷：按name分组单选项，问卷结构与缓存一致时直接按缓存的选项下标选择，
+# 否则按"非常满意" > "满意" > 第一个的顺序选择；点击后填写主观评价文本框，返回校验结果
+FILL_QUESTIONNAIRE_SCRIPT = """
+var text = arguments[0];
+var schemas = arguments[1] || [];
+var labelOf = function (radio) {
+    var lbl = radio.nextElementSibling;
+    while (lbl && !(lbl.tagName === 'SPAN' && lbl.classList.contains('lbl'))) { lbl = lbl.nextElementSibling; }
+    var label = lbl ? lbl.nextElementSibling : null;
+    while (label && label.tagName !== 'SPAN') { label = label.nextElementSibling; }
+    if (label) { return label.innerText; }
+    return radio.parentElement ? radio.parentElement.innerText : '';
+};
+
+var groups = {};
+var names = [];
+var radios = document.querySelectorAll("input[type='radio']");
+for (var i = 0; i < radios.length; i++) {
+    var name = radios[i].name;
+    if (!groups[name]) { groups[name] = []; names.push(name); }
+    groups[name].push(radios[i]);
+}
+
+// 问卷结构签名：按出现顺序列出每组的name和全部选项value
+var signature = names.map(function (name) {
+    return name + '=' + groups[name].map(function (radio) { return radio.value; }).join(',');
+}).join(';');
+var cached = null;
+for (var s = 0; s < schemas.length; s++) {
+    if (schemas[s].signature === signature) { cached = schemas[s].choices; }
+}
+
+var choices = {};
+var selected = 0;
+var missing = [];
+for (var g = 0; g < names.length; g++) {
+    var options = groups[names[g]];
+    var choice = cached ? cached[names[g]] : -1;
+    if (!(choice >= 0 && choice < options.length)) {
+        choice = -1;
+        var satisfied = -1;
+        for (var j = 0; j < options.length; j++) {
+            var label = labelOf(options[j]);
+            if (label.indexOf('非常满意') >= 0) { choice = j; break; }
+            if (satisfied < 0 && label.indexOf('满意') >= 0 && label.indexOf('非常') < 0) { satisfied = j; }
+        }
+        if (choice < 0) { choice = satisfied >= 0 ? satisfied : 0; }
+    }
+    options[choice].click();
+    choices[names[g]] = choice;
+    var checked = false;
+    for (var k = 0; k < options.length; k++) { checked = checked || options[k].checked; }
+    if (checked) { selected++; } else { missing.push(names[g]); }
+}
+
+var textarea = document.querySelector("textarea[name='zgpj']");
+if (textarea) {
+    textarea.value = text;
+    textarea.dispatchEvent(new Event('input', {bubbles: true}));
+    textarea.dispatchEvent(new Event('change', {bubbles: true}));
+}
+return {total: names.length, selected: selected, missing: missing, choices: choices,
+        signature: signature, from_cache: !!cached, text_filled: !!textarea && textarea.value === text};
+"""
+
+# 精简浏览器模式下屏蔽的资源：图片、字体、样式表和统计脚本，脚本只依赖页面结构和业务JS
+LEAN_BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.css',
+    '*google-analytics.com*', '*googletagmanager.com*', '*hm.baidu.com*', '*cnzz.com*', '*analytics*.js',
+]
+
+# 精简浏览器模式下附加的Chrome参数，减少每个浏览器进程的内存和后台活动
+LEAN_CHROME_ARGUMENTS = [
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-dev-shm-usage',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--no-first-run',
+    '--mute-audio',
+    '--blink-settings=imagesEnabled=false',
+    '--renderer-process-limit=1',
+    '--js-flags=--max-old-space-size=128',
+]
+
+# 默认配置，可在创建TeachingEvaluationBot时通过config参数覆盖
+DEFAULT_CONFIG = {
+    'base_url': "http://jwcxk2.aufe.edu.cn",  # 教务系统地址
+    'headless': False,  # 无头模式，不显示浏览器窗口
+    'lean_browser': False,  # 精简浏览器模式：无头、eager页面加载、屏蔽图片字体样式表和统计脚本、省内存参数
+    'blocked_url_patterns': LEAN_BLOCKED_URL_PATTERNS,  # 精简浏览器模式下屏蔽的URL通配符
+    'browser_cache_dir': None,  # 浏览器磁盘缓存的根目录，多次运行之间复用缓存，None使用Chrome默认位置
+    'max_workers': 10,  # 并行评估的线程数
+    'pool_size': 10,  # 驱动池最多同时借出的浏览器数量
+    'pool_warmup': 3,  # 主会话登录的同时在后台预热的浏览器数量，解析课程表格后按课程数增减
+    'pool_max_uses': 0,  # 单个浏览器最多复用次数，0表示不限
+    'pool_health_check': None,  # 自定义健康检查函数 driver -> bool，None使用默认检查
+    'share_session': True,  # 评估会话复用主会话的Cookie，失败时回退到账号密码登录
+    'engine': 'process',  # 执行引擎：process 每门课程一个浏览器，tab 所有课程共用一个浏览器的多个标签页，http 不启动浏览器
+    'max_tabs': 10,  # tab引擎同时打开的评估标签页数量上限
+    'fill_wait_seconds': 120,  # 表单填写完成到提交之间的强制等待时间
+    'launch_interval': 6,  # 相邻两个评估会话的启动间隔
+    'adaptive': False,  # 根据打开表单的延迟和失败率自动调整同时进行的课程数和启动间隔
+    'adaptive_interval_range': (1, 30),  # 自适应启动间隔的上下限（秒）
+    'adaptive_in_flight_range': (1, None),  # 自适应并发的上下限，None表示使用执行引擎的上限
+    'adaptive_target_latency': 5,  # 打开一份表单时等待服务器的目标耗时（秒，不含浏览器启动和登录），低于它时提高并发
+    'adaptive_window': 5,  # 每次调整前收集的观测次数
+    'wait_timeouts': {},  # 覆盖各步骤的条件等待超时（秒），键见DEFAULT_WAIT_TIMEOUTS
+    'http_timeout': 10,  # http引擎单个请求的超时（秒）
+    'schema_cache_path': None,  # 问卷结构缓存文件路径，None表示只缓存在内存中
+    'retry_policies': {},  # 覆盖各阶段的重试策略，如 {'submit': {'max_attempts': 5, 'backoff': 2}}
+    'deep_link': True,  # 解析评估列表时记录每门课程的问卷地址，评估会话直接打开问卷，失败时回退到列表点击
+    'checkpoint_path': None,  # 评估进度检查点文件路径，None表示不保存进度
+    'max_course_attempts': 3,  # 同一门课程（跨多次运行）最多填写提交的次数，达到后不再评估该课程，None表示不限
+    'batch_max_sessions': 10,  # 批量模式下所有账号同时进行的评估会话总数上限，评估浏览器（含空闲）总数也不超过它
+    'batch_max_accounts': 3,  # 批量模式下同时登录的账号数，浏览器引擎中每个账号会占用一个主浏览器
+    'profile': False,  # 统计每个会话、每个阶段的WebDriver命令次数和耗时，结束时打印汇总
+    'profile_events_path': None,  # 性能事件输出文件（JSON Lines），None表示不输出
+    'memory_governor': True,  # 浏览器引擎按内存余量决定是否启动新的评估会话，结束时报告每个会话的内存
+    'min_free_memory_mb': 500,  # 系统可用内存低于此值（MB）时暂缓启动新的评估会话
+    'max_browser_memory_mb': None,  # 所有浏览器合计的内存上限（MB），None表示不限
+    'session_memory_estimate_mb': 300,  # 新评估会话尚未采样到时预留的内存（MB）
+    'memory_sample_interval': 1,  # 内存采样间隔（秒）
+    'progress_view': True,  # 定期打印所有课程所处阶段和剩余等待时间的汇总表格
+    'progress_interval': 10,  # 进度表格的刷新间隔（秒）
+    'progress_log_path': None,  # 进度事件日志文件（JSON Lines），None表示不输出
+    'verify_after_run': True,  # 评估结束后重新加载一次评估列表，只把服务器显示已评估的课程计为成功
+    'verify_requeue_rounds': 1,  # 核对发现提交未生效时重新评估的最多轮数
+    'sweep_stale_drivers': False,  # 启动时结束以前运行中断后遗留的chromedriver和Chrome进程（按启动时间确认是同一进程）
+}
+
+# 各步骤条件等待的默认超时（秒）
+DEFAULT_WAIT_TIMEOUTS = {
+    'default': 10,
+    'login': 10,  # 登录后等待跳转
+    'navigate': 10,  # 菜单跳转、打开评估列表
+    'course_form': 10,  # 打开评估表单
+    'dialog': 5,  # 确认对话框出现
+    'submit': 10,  # 提交后等待对话框关闭和请求完成
+}
+
+class EvaluationCancelled(RuntimeError):
+    """评估被用户中断，不再重试"""
+
+
+class StageError(RuntimeError):
+    """阶段失败但重试可能成功，如服务器返回5xx、页面没有按预期变化；是否重试由阶段的retry_on决定"""
+
+
+class LoginRejected(RuntimeError):
+    """提交登录表单后仍显示登录表单，即学号或密码错误；重试也不会成功，反复提交还可能触发账号锁定，不重试"""
+
+
+# 各阶段的默认重试策略：最多尝试次数、首次退避时间（秒，之后每次翻倍），open阶段还可指定重试时是否换用新的浏览器
+# login为评估浏览器和主会话登录（评估浏览器每次尝试都会新建），open为打开并填写表单，submit为只重新提交已填好的表单，不重复等待
+DEFAULT_RETRY_POLICIES = {
+    'login': {'max_attempts': 3, 'backoff': 2},
+    'open': {'max_attempts': 3, 'backoff': 1, 'recreate_driver': False},
+    'submit': {'max_attempts': 3, 'backoff': 1},
+}
+
+# 重试策略中未指定的项
+RETRY_POLICY_DEFAULTS = {
+    'max_attempts': 1,
+    'backoff': 1,
+    'max_backoff': 30,  # 退避时间上限（秒）
+    'recreate_driver': False,  # 只对open阶段生效：重试时即使浏览器正常也换用驱动池中的另一个
+    # 可以重试的异常：等待超时、元素失效或找不到、浏览器通信错误、网络错误、StageError；其他异常直接向上抛出
+    'retry_on': (WebDriverException, OSError, http.client.HTTPException, StageError),
+}
+
+
+def default_driver_health_check(driver):
+    """默认健康检查：浏览器仍能响应且窗口未被关闭"""
+    try:
+        return bool(driver.window_handles) and driver.execute_script("return document.readyState") is not None
+    except Exception:
+        return False
+
+
+def print_session_message(session_num, message):
+    """直接打印评估会话的过程信息"""
+    print(f"评估会话 {session_num}: {message}")
+
+
+class DriverPool:
+    """已登录浏览器驱动池，借出时优先复用空闲driver，避免每门课程都冷启动Chrome
+
+    空闲、预热中和已借出的driver总数不超过max_size。预热在后台进行，借出时如果没有空闲driver但有
+    正在预热的driver，会等待预热完成而不是另外新建。
+    """
+
+    def __init__(self, factory, max_size=10, health_check=None, max_uses=0, log=None):
+        self.factory = factory  # 创建并登录新driver的函数，参数为会话编号
+        self.log = log or print_session_message  # 输出会话过程信息的函数 (会话编号, 信息)
+        self.max_size = max_size
+        self.health_check = health_check or default_driver_health_check
+        self.max_uses = max_uses
+        self.idle = []  # 空闲的已登录driver
+        self.use_counts = {}  # driver -> 已借出次数
+        self.slots = threading.BoundedSemaphore(max_size)  # 限制同时借出的数量
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)  # 预热完成时通知等待借出的线程
+        self.warming = 0  # 正在预热的driver数量
+        self.borrowed = 0  # 已借出的driver数量
+        self.warm_target = max_size  # 预热完成时最多保留的driver总数
+        self.warm_sequence = itertools.count(1)
+        self.closed = False
+
+        # 统计信息
+        self.hits = 0  # 复用空闲driver的次数
+        self.misses = 0  # 新建driver的次数
+        self.recycled = 0  # 因不健康或超出复用次数被回收的次数
+
+    def warm_up(self, count, wait=True):
+        """并行预热driver，使空闲、预热中和已借出的driver总数达到count；wait为False时在后台预热"""
+        with self.lock:
+            self.warm_target = min(count, self.max_size)
+            count = self.warm_target - len(self.idle) - self.warming - self.borrowed
+            if count <= 0 or self.closed:
+                return
+            self.warming += count
+            names = [f"预热{next(self.warm_sequence)}" for _ in range(count)]
+        print(f"正在预热 {count} 个评估浏览器...")
+        threads = [threading.Thread(target=self._warm_one, args=(name,), daemon=True) for name in names]
+        for thread in threads:
+            thread.start()
+        if wait:
+            for thread in threads:
+                thread.join()
+            print(f"浏览器预热完成，空闲浏览器数量: {len(self.idle)}")
+
+    def size(self):
+        """空闲、预热中和已借出的driver总数"""
+        with self.lock:
+            return len(self.idle) + self.warming + self.borrowed
+
+    def idle_count(self):
+        with self.lock:
+            return len(self.idle)
+
+    def close_idle(self, count):
+        """关闭最多count个空闲driver，返回实际关闭的数量"""
+        with self.lock:
+            drivers = [self.idle.pop() for _ in range(min(count, len(self.idle)))]
+        for driver in drivers:
+            self._discard(driver, count_recycle=False)
+        return len(drivers)
+
+    def shrink(self, count):
+        """课程数少于已预热的数量时关闭多余的空闲driver，之后预热完成的多余driver也直接关闭"""
+        with self.lock:
+            self.warm_target = min(count, self.max_size)
+            surplus = max(0, len(self.idle) + self.borrowed - self.warm_target)
+            drivers = [self.idle.pop() for _ in range(min(surplus, len(self.idle)))]
+        if drivers:
+            print(f"需要评估的课程较少，关闭 {len(drivers)} 个多余的预热浏览器")
+        for driver in drivers:
+            self._discard(driver, count_recycle=False)
+
+    def _warm_one(self, session_num):
+        """创建一个driver并放入空闲列表"""
+        driver = None
+        try:
+            driver = self.factory(session_num)
+        except Exception as e:
+            print(f"评估会话 {session_num}: 预热浏览器失败: {e}")
+        with self.condition:
+            self.warming -= 1
+            self.condition.notify_all()
+            if driver is None:
+                return
+            if not self.closed and len(self.idle) + self.borrowed < self.warm_target:
+                self.use_counts[driver] = 0
+                self.idle.append(driver)
+                return
+        self._discard(driver, count_recycle=False)
+
+    def acquire(self, session_num):
+        """借出一个已登录的driver，池满时阻塞等待"""
+        self.slots.acquire()
+        try:
+            while True:
+                with self.condition:
+                    # 没有空闲driver但有正在预热的driver时等待预热完成
+                    while not self.idle and self.warming and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        raise RuntimeError("驱动池已关闭")
+                    driver = self.idle.pop() if self.idle else None
+                if driver is None:
+                    break
+                if self.health_check(driver):
+                    with self.lock:
+                        self.hits += 1
+                        self.borrowed += 1
+                    self.log(session_num, "复用已登录的浏览器")
+                    return driver
+                self.log(session_num, "空闲浏览器未通过健康检查，已回收")
+                self._discard(driver)
+
+            driver = self.factory(session_num)
+            with self.lock:
+                self.misses += 1
+                self.borrowed += 1
+                self.use_counts[driver] = 0
+            return driver
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, driver, healthy=True):
+        """归还driver，不健康或超出复用次数的driver会被关闭"""
+        try:
+            with self.lock:
+                self.borrowed -= 1
+                self.use_counts[driver] = self.use_counts.get(driver, 0) + 1
+                worn_out = self.max_uses and self.use_counts[driver] >= self.max_uses
+                if healthy and not worn_out and not self.closed:
+                    self.idle.append(driver)
+                    return
+            self._discard(driver)
+        finally:
+            self.slots.release()
+
+    def _discard(self, driver, count_recycle=True):
+        """关闭并移除driver"""
+        with self.lock:
+            self.use_counts.pop(driver, None)
+            if count_recycle:
+                self.recycled += 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """关闭所有空闲driver，之后归还和预热完成的driver也会直接关闭"""
+        with self.condition:
+            self.closed = True
+            drivers = self.idle
+            self.idle = []
+            self.condition.notify_all()
+        for driver in drivers:
+            self._discard(driver, count_recycle=False)
+
+
+class ServerLatencyMeter:
+    """按线程累计一次打开表单中等待服务器的时间（页面加载、导航等待和HTTP请求）
+
+    调度器在打开表单前后调用begin/end，借出浏览器（冷启动和登录）期间暂停计量，重试退避不是等待服务器，
+    都不计入，自适应启动策略据此判断服务器负载。
+    """
 
-class TeachingEvaluationBot:
     def __init__(self):
-        # 设置Chrome选项
-        self.chrome_options = Options()
-        # 忽略SSL证书错误
-        self.chrome_options.add_argument('--ignore-certificate-errors')
-        self.chrome_options.add_argument('--ignore-ssl-errors')
-        # 可选：无头模式，如果需要可视化可以注释掉
-        # self.chrome_options.add_argument('--headless')
+        self.local = threading.local()
+
+    def begin(self):
+        """开始计量当前线程"""
+        self.local.total = 0.0
+        self.local.count = 0
+        self.local.paused = 0
+        self.local.active = True
+
+    def end(self):
+        """结束计量，返回累计耗时，期间没有等待服务器时返回None"""
+        if not getattr(self.local, 'active', False):
+            return None
+        self.local.active = False
+        return self.local.total if self.local.count else None
+
+    def add(self, seconds):
+        """计入一次等待，当前线程未在计量或已暂停时忽略"""
+        local = self.local
+        if getattr(local, 'active', False) and not local.paused:
+            local.total += seconds
+            local.count += 1
+
+    @contextlib.contextmanager
+    def paused(self):
+        """暂停计量当前线程，如借出浏览器时的冷启动和登录"""
+        local = self.local
+        if not getattr(local, 'active', False):
+            yield
+            return
+        local.paused += 1
+        try:
+            yield
+        finally:
+            local.paused -= 1
+
+
+SERVER_LATENCY = ServerLatencyMeter()
+
+
+class WaitStrategy:
+    """条件驱动的等待层：每一步都等待明确的页面条件，并记录每个条件的实际耗时"""
+
+    def __init__(self, timeouts=None, poll_frequency=0.2, cancel_event=None):
+        self.timeouts = {**DEFAULT_WAIT_TIMEOUTS, **(timeouts or {})}
+        self.poll_frequency = poll_frequency
+        self.cancel_event = cancel_event or threading.Event()  # 置位后等待立即结束
+        self.records = {}  # (步骤, 条件) -> [耗时, ...]
+        self.timeout_counts = {}  # (步骤, 条件) -> 超时次数
+        self.lock = threading.Lock()
+        self.on_timeout = None  # 超时回调 (步骤, 耗时)，供自适应调度统计错误率
+        self.local = threading.local()  # 当前线程是否处于预期会超时的等待中
+
+    def until(self, driver, step, name, condition):
+        """在步骤超时内等待条件成立，返回条件结果，超时抛出TimeoutException，取消时抛出EvaluationCancelled"""
+        timeout = self.timeouts.get(step, self.timeouts['default'])
+        cancel_event = self.cancel_event
+
+        def check(d):
+            if cancel_event.is_set():
+                raise EvaluationCancelled("评估已取消")
+            return condition(d)
+
+        start_time = time.time()
+        try:
+            result = WebDriverWait(driver, timeout, poll_frequency=self.poll_frequency).until(check)
+        except TimeoutException:
+            self._record(step, name, time.time() - start_time, timed_out=True)
+            raise
+        self._record(step, name, time.time() - start_time)
+        return result
+
+    def _record(self, step, name, elapsed, timed_out=False):
+        """记录条件耗时；预期内的超时只做统计，不计入服务器延迟，也不回调on_timeout"""
+        key = (step, name)
+        with self.lock:
+            self.records.setdefault(key, []).append(elapsed)
+            if timed_out:
+                self.timeout_counts[key] = self.timeout_counts.get(key, 0) + 1
+        if timed_out and getattr(self.local, 'tolerant', 0):
+            return
+        SERVER_LATENCY.add(elapsed)
+        if timed_out and self.on_timeout:
+            self.on_timeout(step, elapsed)
+
+    @contextlib.contextmanager
+    def tolerate_timeouts(self):
+        """其中的等待超时属于正常情况（如页面稳定等待、探测问卷是否出现），不视为服务器错误"""
+        self.local.tolerant = getattr(self.local, 'tolerant', 0) + 1
+        try:
+            yield
+        finally:
+            self.local.tolerant -= 1
+
+    def url_changed(self, driver, old_url, step):
+        """等待URL变化"""
+        return self.until(driver, step, 'url_changed', lambda d: d.current_url != old_url)
+
+    def element_present(self, driver, locator, step):
+        """等待元素出现在DOM中"""
+        return self.until(driver, step, 'element_present', EC.presence_of_element_located(locator))
+
+    def element_clickable(self, driver, locator, step):
+        """等待元素可点击"""
+        return self.until(driver, step, 'element_clickable', EC.element_to_be_clickable(locator))
+
+    def page_replaced(self, driver, old_page, step):
+        """等待旧页面的根元素失效，即浏览器已加载新页面（提交到相同URL时也能判断）"""
+        return self.until(driver, step, 'page_replaced', EC.staleness_of(old_page))
+
+    def page_ready(self, driver, step):
+        """等待document.readyState为complete"""
+        return self.until(driver, step, 'page_ready',
+                          lambda d: d.execute_script("return document.readyState") == "complete")
+
+    def ajax_idle(self, driver, step):
+        """等待jQuery没有进行中的AJAX请求（页面没有jQuery时视为空闲）"""
+        return self.until(driver, step, 'ajax_idle',
+                          lambda d: d.execute_script("return window.jQuery ? jQuery.active === 0 : true"))
+
+    def dialog_visible(self, driver, step='dialog'):
+        """等待layui确认对话框出现，返回对话框元素"""
+        return self.until(driver, step, 'dialog_visible',
+                          EC.visibility_of_element_located((By.CLASS_NAME, "layui-layer-dialog")))
+
+    def dialog_gone(self, driver, step='submit'):
+        """等待layui确认对话框关闭"""
+        return self.until(driver, step, 'dialog_gone',
+                          EC.invisibility_of_element_located((By.CLASS_NAME, "layui-layer-dialog")))
+
+    def settle(self, driver, step):
+        """等待页面加载完成且AJAX空闲，超时不视为错误（后续的元素等待会兜底）"""
+        try:
+            with self.tolerate_timeouts():
+                self.page_ready(driver, step)
+                self.ajax_idle(driver, step)
+            return True
+        except TimeoutException:
+            return False
+
+    def print_summary(self):
+        """打印各等待条件的耗时统计"""
+        if not self.records:
+            return
+        print("\n等待条件耗时统计:")
+        print(f"{'步骤':<12} {'条件':<18} {'次数':>4} {'平均(秒)':>8} {'最长(秒)':>8} {'超时':>4}")
+        with self.lock:
+            for (step, name), durations in sorted(self.records.items()):
+                average = sum(durations) / len(durations)
+                timeouts = self.timeout_counts.get((step, name), 0)
+                print(f"{step:<12} {name:<18} {len(durations):>4} {average:>8.2f} {max(durations):>8.2f} {timeouts:>4}")
+
+
+class StageRetry:
+    """分阶段重试：每个阶段按自己的策略重试，只重做失败的阶段，并统计各阶段的重试次数"""
+
+    def __init__(self, policies=None, cancel_event=None):
+        policies = policies or {}
+        self.cancel_event = cancel_event or threading.Event()  # 置位后不再重试
+        self.policies = {
+            stage: {**RETRY_POLICY_DEFAULTS, **DEFAULT_RETRY_POLICIES.get(stage, {}), **policies.get(stage, {})}
+            for stage in {*DEFAULT_RETRY_POLICIES, *policies}
+        }
+        self.retries = {}  # 阶段 -> 重试次数
+        self.recovered = {}  # 阶段 -> 重试后成功的次数
+        self.exhausted = {}  # 阶段 -> 用完重试次数仍失败的次数
+        self.lock = threading.Lock()
+
+    def policy(self, stage):
+        return self.policies.get(stage, RETRY_POLICY_DEFAULTS)
+
+    def _count(self, counter, stage):
+        with self.lock:
+            counter[stage] = counter.get(stage, 0) + 1
+
+    def run(self, stage, session_num, attempt, on_retry=None, stop=None):
+        """执行attempt()并返回其结果；抛出retry_on中的异常时按指数退避重试，其他异常直接向上抛出
+
+        attempt()返回假值表示重试也不会成功的失败（如课程没有评估入口），直接返回，不再重试。
+        on_retry() 在每次重试前调用，用于更换浏览器等清理工作。用完重试次数后重新抛出最后一次的异常；
+        取消事件置位或stop()返回真值后抛出EvaluationCancelled。
+        """
+        policy = self.policy(stage)
+        max_attempts = max(policy['max_attempts'], 1)
+        for number in range(1, max_attempts + 1):
+            if self.cancel_event.is_set():
+                raise EvaluationCancelled("评估已取消")
+            if stop and stop():
+                raise EvaluationCancelled(f"{stage}阶段已中止")
+            try:
+                result = attempt()
+            except policy['retry_on'] as e:
+                error = e
+            else:
+                if result and number > 1:
+                    self._count(self.recovered, stage)
+                return result
+            if number == max_attempts:
+                break
+            delay = min(policy['backoff'] * 2 ** (number - 1), policy['max_backoff'])
+            reason = f": {str(error).splitlines()[0] if str(error) else type(error).__name__}"
+            print(f"评估会话 {session_num}: {stage}阶段第 {number} 次失败{reason}，{delay:.1f} 秒后重试")
+            self._count(self.retries, stage)
+            if self.cancel_event.wait(delay):
+                raise EvaluationCancelled("评估已取消")
+            if on_retry:
+                on_retry()
+        self._count(self.exhausted, stage)
+        raise error
+
+    def print_summary(self):
+        """打印各阶段的重试统计"""
+        stages = sorted(set(self.retries) | set(self.exhausted))
+        if not stages:
+            return
+        print("\n重试统计:")
+        print(f"{'阶段':<8} {'重试':>4} {'重试后成功':>10} {'放弃':>4}")
+        for stage in stages:
+            print(f"{stage:<8} {self.retries.get(stage, 0):>4} {self.recovered.get(stage, 0):>10} "
+                  f"{self.exhausted.get(stage, 0):>4}")
+
+
+def percentile(values, fraction):
+    """返回已排序列表的分位数"""
+    if not values:
+        return 0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class CommandProfiler:
+    """性能分析层：包装driver，按会话和阶段统计每条WebDriver命令的次数和耗时
+
+    阶段：login 登录、navigate 导航、locate 定位课程、fill 选择选项并填写评价、
+    wait 强制等待、submit 提交、dialog 确认对话框。开启事件输出时每条命令和每个阶段
+    都会写一行JSON，运行结束打印各阶段耗时分布和最耗时的定位表达式。
+    """
+
+    HISTOGRAM_BOUNDS = [0.01, 0.05, 0.1, 0.5, 1, 5]  # 耗时分布的区间上界（秒）
+
+    def __init__(self, enabled=False, events_path=None):
+        self.enabled = enabled
+        self.local = threading.local()  # 当前线程所处的阶段和会话
+        self.lock = threading.Lock()
+        self.command_stats = {}  # (阶段, 命令) -> [耗时, ...]
+        self.target_stats = {}  # 定位表达式或脚本 -> [耗时, ...]
+        self.phase_stats = {}  # 阶段 -> [耗时, ...]
+        self.session_counts = {}  # 会话 -> 命令数
+        self.events_file = open(events_path, 'a', encoding='utf-8') if enabled and events_path else None
+        self.on_phase = None  # 进入阶段时的回调 (会话, 阶段)，供进度视图使用，不受enabled影响
+
+    def attach(self, driver):
+        """包装driver.execute，所有命令（包括WebElement上的操作）都会经过它"""
+        if not self.enabled:
+            return driver
+        original_execute = driver.execute
+        profiler = self
+
+        def execute(driver_command, params=None):
+            start_time = time.time()
+            try:
+                return original_execute(driver_command, params)
+            finally:
+                profiler.record_command(driver_command, params, time.time() - start_time)
+
+        driver.execute = execute
+        return driver
+
+    @contextlib.contextmanager
+    def phase(self, name, session=None):
+        """标记当前线程进入某个阶段，可嵌套"""
+        previous = (getattr(self.local, 'phase', None), getattr(self.local, 'session', None))
+        self.local.phase = name
+        if session is not None:
+            self.local.session = session
+        current_session = getattr(self.local, 'session', None)
+        if self.on_phase and current_session is not None:
+            self.on_phase(current_session, name)
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            current_session = getattr(self.local, 'session', None)
+            self.local.phase, self.local.session = previous
+            if self.enabled:
+                self.record_phase(name, current_session, time.time() - start_time)
+
+    def record_phase(self, name, session, duration):
+        """记录一个阶段的耗时"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.phase_stats.setdefault(name, []).append(duration)
+        self._emit({'type': 'phase', 'session': session, 'phase': name, 'duration': round(duration, 4)})
+
+    def record_command(self, command, params, duration):
+        """记录一条命令的耗时"""
+        phase = getattr(self.local, 'phase', None) or 'other'
+        session = getattr(self.local, 'session', None)
+        target = self._describe_target(command, params or {})
+        with self.lock:
+            self.command_stats.setdefault((phase, command), []).append(duration)
+            if target:
+                self.target_stats.setdefault(target, []).append(duration)
+            self.session_counts[session] = self.session_counts.get(session, 0) + 1
+        self._emit({'type': 'command', 'session': session, 'phase': phase, 'command': command,
+                    'target': target, 'duration': round(duration, 4)})
+
+    @staticmethod
+    def _describe_target(command, params):
+        """提取命令的定位表达式、脚本开头或URL，便于找出最耗时的查找"""
+        if 'using' in params and 'value' in params:
+            return f"{params['using']}={params['value']}"
+        if 'script' in params:
+            return "script: " + " ".join(params['script'].split())[:60]
+        if 'url' in params:
+            return params['url']
+        return ''
+
+    def _emit(self, event):
+        if not self.events_file:
+            return
+        event['ts'] = round(time.time(), 4)
+        line = json.dumps(event, ensure_ascii=False)
+        with self.lock:
+            self.events_file.write(line + '\n')
+
+    def _histogram(self, durations):
+        counts = [0] * (len(self.HISTOGRAM_BOUNDS) + 1)
+        for duration in durations:
+            for i, bound in enumerate(self.HISTOGRAM_BOUNDS):
+                if duration < bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return counts
+
+    def print_summary(self):
+        """打印各阶段耗时分布、命令统计和最耗时的定位表达式"""
+        if not self.enabled:
+            return
+        with self.lock:
+            phase_stats = {name: sorted(values) for name, values in self.phase_stats.items()}
+            command_stats = {key: list(values) for key, values in self.command_stats.items()}
+            target_stats = {key: list(values) for key, values in self.target_stats.items()}
+            session_counts = dict(self.session_counts)
+
+        buckets = [f"<{bound * 1000:g}ms" if bound < 1 else f"<{bound:g}s" for bound in self.HISTOGRAM_BOUNDS]
+        buckets.append(f">={self.HISTOGRAM_BOUNDS[-1]:g}s")
+        print("\n性能分析 - 阶段耗时（秒）:")
+        print(f"{'阶段':<10} {'次数':>4} {'总计':>8} {'平均':>7} {'P95':>7} {'最长':>7}  " +
+              " ".join(f"{bucket:>7}" for bucket in buckets))
+        for name, values in sorted(phase_stats.items(), key=lambda item: -sum(item[1])):
+            histogram = " ".join(f"{count:>7}" for count in self._histogram(values))
+            print(f"{name:<10} {len(values):>4} {sum(values):>8.2f} {sum(values) / len(values):>7.3f} "
+                  f"{percentile(values, 0.95):>7.3f} {values[-1]:>7.3f}  {histogram}")
+
+        total_commands = sum(len(values) for values in command_stats.values())
+        print(f"\n性能分析 - 命令统计（共 {total_commands} 条）:")
+        print(f"{'阶段':<10} {'命令':<24} {'次数':>5} {'总计(秒)':>9} {'平均(秒)':>9}")
+        for (phase, command), values in sorted(command_stats.items(), key=lambda item: -sum(item[1]))[:15]:
+            print(f"{phase:<10} {command:<24} {len(values):>5} {sum(values):>9.2f} {sum(values) / len(values):>9.3f}")
+
+        if session_counts:
+            print("\n性能分析 - 各会话命令数:")
+            print(", ".join(f"{'其他' if session is None else session}: {count}"
+                            for session, count in sorted(session_counts.items(), key=lambda item: str(item[0]))))
+
+        if target_stats:
+            print("\n性能分析 - 最耗时的定位表达式/脚本:")
+            for target, values in sorted(target_stats.items(), key=lambda item: -sum(item[1]))[:10]:
+                print(f"{sum(values):>8.2f} 秒 {len(values):>4} 次  {target}")
+
+    def close(self):
+        if self.events_file:
+            with self.lock:
+                self.events_file.close()
+                self.events_file = None
+
+
+def process_table():
+    """返回所有进程的 {pid: (父进程pid, 常驻内存字节数)}，没有psutil时读取Linux的/proc"""
+    table = {}
+    if psutil:
+        for process in psutil.process_iter(['ppid', 'memory_info']):
+            memory_info = process.info['memory_info']
+            table[process.pid] = (process.info['ppid'], memory_info.rss if memory_info else 0)
+        return table
+    if not os.path.isdir('/proc'):
+        return table
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        table[int(entry)] = (int(fields[1]), int(fields[21]) * page_size)
+    return table
+
+
+def process_tree(pid, table=None):
+    """返回进程及其所有子进程的pid列表，父进程在前；进程不存在时返回空列表"""
+    table = process_table() if table is None else table
+    if pid not in table:
+        return []
+    children = {}
+    for child, (parent, _) in table.items():
+        if child != parent:
+            children.setdefault(parent, []).append(child)
+    tree = [pid]
+    for current in tree:
+        tree.extend(children.get(current, []))
+    return tree
+
+
+def process_tree_rss(pid, table=None):
+    """统计进程及其所有子进程（chromedriver下的Chrome各进程）的常驻内存，单位字节"""
+    table = process_table() if table is None else table
+    return sum(table[current][1] for current in process_tree(pid, table))
+
+
+def available_memory():
+    """系统可用内存（字节），无法获取时返回None"""
+    if psutil:
+        return psutil.virtual_memory().available
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemoryGovernor:
+    """内存调度：后台采样每个浏览器（chromedriver及其Chrome进程树）的常驻内存和系统可用内存，
+    只有内存有余量时才允许启动新的评估会话，运行结束时报告每个会话的内存峰值和平均值
+
+    新浏览器启动后要过一会儿内存才涨上来，因此每次放行都按session_estimate预留一份，
+    直到下一次采样反映出实际占用。
+    """
+
+    MB = 1024 * 1024
+
+    def __init__(self, min_free_mb=500, max_browser_mb=None, session_estimate_mb=300, interval=1):
+        self.min_free = min_free_mb * self.MB  # 系统至少保留的可用内存
+        self.max_browser = max_browser_mb * self.MB if max_browser_mb else None  # 所有浏览器合计的内存上限
+        self.session_estimate = session_estimate_mb * self.MB  # 尚未采样到的新会话按此估算
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.browsers = {}  # driver -> (名称, chromedriver进程pid)
+        self.assigned = {}  # driver -> 当前使用它的会话编号
+        self.session_samples = {}  # 会话编号 -> [借出期间所用浏览器的内存字节数, ...]
+        self.browser_samples = {}  # 浏览器名称 -> [内存字节数, ...]
+        self.total_samples = []  # 所有浏览器合计的内存
+        self.free_samples = []  # 系统可用内存
+        self.reserved = 0  # 上次采样后放行的会话预留的内存
+        self.last_total = 0
+        self.last_free = None
+        self.deferred = 0  # 因内存不足推迟启动的次数
+        self.throttled = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """启动后台采样线程，重复调用无影响"""
+        with self.lock:
+            if self.thread:
+                return
+            self.thread = threading.Thread(target=self._run, daemon=True)
+        self.sample()
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def track(self, driver, name):
+        """登记一个浏览器，driver.service.process为chromedriver进程"""
+        try:
+            pid = driver.service.process.pid
+        except AttributeError:
+            return
+        with self.lock:
+            self.browsers[driver] = (f"{name} ({pid})", pid)
+
+    def untrack(self, driver):
+        with self.lock:
+            self.browsers.pop(driver, None)
+            self.assigned.pop(driver, None)
+
+    def assign(self, driver, session_num):
+        """会话借出浏览器期间，该浏览器的内存计入这个会话"""
+        with self.lock:
+            if driver in self.browsers:
+                self.assigned[driver] = session_num
+
+    def unassign(self, driver):
+        with self.lock:
+            self.assigned.pop(driver, None)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"内存采样出错: {e}")
+
+    def sample(self):
+        """采样一次所有浏览器的内存和系统可用内存"""
+        with self.lock:
+            browsers = dict(self.browsers)
+        table = process_table()
+        usage = {driver: process_tree_rss(pid, table) for driver, (_, pid) in browsers.items()}
+        free = available_memory()
+        with self.lock:
+            for driver, rss in usage.items():
+                if not rss or driver not in self.browsers:
+                    continue
+                self.browser_samples.setdefault(self.browsers[driver][0], []).append(rss)
+                if driver in self.assigned:
+                    self.session_samples.setdefault(self.assigned[driver], []).append(rss)
+            self.last_total = sum(usage.values())
+            self.last_free = free
+            self.total_samples.append(self.last_total)
+            if free is not None:
+                self.free_samples.append(free)
+            self.reserved = 0
+
+    def has_headroom(self):
+        """按最近一次采样加上预留判断能否再启动一个会话"""
+        if self.last_free is not None and self.last_free - self.reserved - self.session_estimate < self.min_free:
+            return False
+        if self.max_browser and self.last_total + self.reserved + self.session_estimate > self.max_browser:
+            return False
+        return True
+
+    def admit(self):
+        """准入判断：有余量时预留一份内存并返回True，否则返回False"""
+        with self.lock:
+            allowed = self.has_headroom()
+            if allowed:
+                self.reserved += self.session_estimate
+            else:
+                self.deferred += 1
+            changed = allowed == self.throttled
+            self.throttled = not allowed
+            free = self.last_free
+            total = self.last_total
+        if changed:
+            free_text = f"{free / self.MB:.0f} MB" if free is not None else "未知"
+            if allowed:
+                print(f"内存恢复: 可用 {free_text}，继续启动评估会话")
+            else:
+                print(f"内存不足: 可用 {free_text}，浏览器共占用 {total / self.MB:.0f} MB，暂缓启动新的评估会话")
+        return allowed
+
+    def capacity(self):
+        """按最近一次采样估算还能再启动的浏览器数量，内存信息未知时返回None"""
+        with self.lock:
+            limits = []
+            if self.last_free is not None:
+                limits.append((self.last_free - self.reserved - self.min_free) // self.session_estimate)
+            if self.max_browser:
+                limits.append((self.max_browser - self.last_total - self.reserved) // self.session_estimate)
+        if not limits:
+            return None
+        return max(int(min(limits)), 0)
+
+    def print_summary(self):
+        """打印每个会话和每个浏览器的内存峰值和平均值，以及所有浏览器合计的峰值"""
+        with self.lock:
+            rows = [("会话", key, list(values)) for key, values in self.session_samples.items()]
+            rows += [("浏览器", key, list(values)) for key, values in self.browser_samples.items()]
+            total_samples = list(self.total_samples)
+            free_samples = list(self.free_samples)
+            deferred = self.deferred
+        if not rows:
+            return
+        print("\n内存统计（MB）:")
+        print(f"{'类型':<6} {'名称':<20} {'采样':>4} {'峰值':>8} {'平均':>8}")
+        for kind, name, values in sorted(rows, key=lambda row: (row[0], str(row[1]))):
+            print(f"{kind:<6} {str(name):<20} {len(values):>4} {max(values) / self.MB:>8.1f} "
+                  f"{sum(values) / len(values) / self.MB:>8.1f}")
+        busy = [value for value in total_samples if value]
+        if busy:
+            print(f"所有浏览器合计: 峰值 {max(busy) / self.MB:.1f} MB, 平均 {sum(busy) / len(busy) / self.MB:.1f} MB")
+        if free_samples:
+            print(f"系统可用内存最低: {min(free_samples) / self.MB:.0f} MB, 因内存不足推迟启动 {deferred} 次")
+
+
+def make_memory_governor(config):
+    """按配置创建内存调度，http引擎不启动浏览器，不需要"""
+    if not config['memory_governor'] or config['engine'] == 'http':
+        return None
+    return MemoryGovernor(config['min_free_memory_mb'], config['max_browser_memory_mb'],
+                          config['session_memory_estimate_mb'], config['memory_sample_interval'])
+
+
+def process_start_time(pid):
+    """返回进程的启动时间，用于确认进程号没有被其他程序复用；进程不存在或无法获取时返回None
+
+    Linux上读取/proc/<pid>/stat的第22项（开机后的时钟滴答数），其他系统使用psutil的create_time。
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # 进程名可能含空格和括号，从最后一个')'之后数起，第1项为第3项state，第20项为第22项starttime
+            return float(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        pass
+    if psutil:
+        try:
+            return round(psutil.Process(pid).create_time(), 2)
+        except psutil.Error:
+            return None
+    return None
+
+
+def kill_process_tree(pid):
+    """强制结束进程及其所有子进程，进程不存在时忽略"""
+    if psutil:
+        try:
+            root = psutil.Process(pid)
+            processes = root.children(recursive=True) + [root]
+        except psutil.Error:
+            return
+        for process in processes:
+            try:
+                process.kill()
+            except psutil.Error:
+                pass
+        return
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)], capture_output=True)
+        return
+    for child in reversed(process_tree(pid)):
+        try:
+            os.kill(child, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+class DriverRegistry:
+    """记录本进程启动的所有浏览器，保证中断或异常退出时关闭它们
+
+    Ctrl+C时置位取消事件，等待和重试循环看到后立即结束，同时在后台并行关闭所有浏览器；
+    程序退出时再关闭一次遗漏的浏览器。chromedriver和Chrome的进程号和启动时间写入pid_file，下次启动时
+    结束所属进程已经退出的遗留进程；启动时间对不上的进程号已被复用，不会结束。
+    """
+
+    def __init__(self, pid_file):
+        self.pid_file = pid_file
+        self.lock = threading.RLock()  # 信号处理函数可能在主线程持有锁时运行
+        self.drivers = {}  # driver -> [(chromedriver进程pid, 启动时间), (Chrome主进程pid, 启动时间), ...]
+        self.owner_start = process_start_time(os.getpid())
+        self.cancel_event = threading.Event()  # 置位后所有评估会话尽快结束
+        self.handlers_installed = False
+        self.swept = False
+
+    def install_handlers(self):
+        """注册SIGINT和退出时的清理，只能在主线程中注册，重复调用无影响"""
+        if self.handlers_installed or threading.current_thread() is not threading.main_thread():
+            return
+        self.handlers_installed = True
+        signal.signal(signal.SIGINT, self._handle_interrupt)
+        atexit.register(self.quit_all)
+
+    def _handle_interrupt(self, signum, frame):
+        if not self.cancel_event.is_set():
+            print("\n收到中断信号，正在取消评估并关闭所有浏览器...")
+            self.cancel_event.set()
+            threading.Thread(target=self.quit_all, daemon=True).start()
+        raise KeyboardInterrupt
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def register(self, driver):
+        """登记一个新启动的浏览器"""
+        try:
+            pid = driver.service.process.pid
+        except AttributeError:
+            return
+        # Chrome主进程是chromedriver的子进程，chromedriver被结束后它会变成孤儿进程，一并记录
+        pids = [pid] + [child for child, (parent, _) in process_table().items() if parent == pid]
+        processes = [(pid, process_start_time(pid)) for pid in pids]
+        with self.lock:
+            self.drivers[driver] = processes
+            self._save()
+
+    def unregister(self, driver):
+        with self.lock:
+            if self.drivers.pop(driver, None) is not None:
+                self._save()
+
+    def quit_all(self, timeout=10):
+        """并行关闭所有已登记的浏览器，关闭失败或超时的直接结束其进程"""
+        with self.lock:
+            drivers = dict(self.drivers)
+        if not drivers:
+            return
+        print(f"正在关闭 {len(drivers)} 个浏览器...")
+        closed = set()
+
+        def quit_one(driver):
+            try:
+                driver.quit()
+                closed.add(driver)
+            except Exception:
+                pass
+
+        threads = [threading.Thread(target=quit_one, args=(driver,), daemon=True) for driver in drivers]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + timeout
+        for thread in threads:
+            thread.join(max(deadline - time.time(), 0))
+        for driver, processes in drivers.items():
+            if driver not in closed:
+                for pid, _ in processes:
+                    kill_process_tree(pid)
+                self.unregister(driver)
+
+    def sweep_stale(self):
+        """结束以前运行遗留的chromedriver和Chrome进程：只处理所属脚本进程已经退出的记录
+
+        进程号可能已被其他程序（如用户自己的Chrome）复用，只结束启动时间与记录一致的进程。
+        """
+        with self.lock:
+            if self.swept:
+                return
+            self.swept = True
+        killed = 0
+        for owner, owner_start, pid, start in self._read_entries():
+            if owner == os.getpid() or process_start_time(owner) == owner_start:
+                continue
+            if process_start_time(pid) == start:
+                kill_process_tree(pid)
+                killed += 1
+        if killed:
+            print(f"已结束 {killed} 个以前运行遗留的浏览器进程")
+        with self.lock:
+            self._save()
+
+    def _read_entries(self):
+        """读取pid_file中的(所属脚本进程, 其启动时间, 浏览器进程, 其启动时间)记录，格式不对的行忽略"""
+        entries = []
+        try:
+            with open(self.pid_file, encoding='utf-8') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) != 4:
+                        continue
+                    try:
+                        entries.append((int(fields[0]), float(fields[1]), int(fields[2]), float(fields[3])))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return entries
+
+    def _save(self):
+        """写入本进程的浏览器进程记录，保留其他仍在运行的脚本进程的记录（调用方需持有lock）
+
+        无法获取启动时间的进程不写入，下次启动时也就不会被结束。
+        """
+        owner = os.getpid()
+        entries = [entry for entry in self._read_entries()
+                   if entry[0] != owner and process_start_time(entry[0]) == entry[1]]
+        if self.owner_start is not None:
+            entries += [(owner, self.owner_start, pid, start)
+                        for processes in self.drivers.values() for pid, start in processes if start is not None]
+        temp_path = f"{self.pid_file}.{owner}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(f"{other} {other_start!r} {pid} {start!r}\n"
+                             for other, other_start, pid, start in entries)
+            os.replace(temp_path, self.pid_file)
+        except OSError as e:
+            print(f"保存浏览器进程记录失败: {e}")
+
+
+# 本进程启动的所有浏览器，批量模式下所有账号共用
+DRIVER_REGISTRY = DriverRegistry(os.path.join(tempfile.gettempdir(), "teaching_evaluation_drivers.txt"))
+
+
+def shutdown_executor(executor, cancelled=False):
+    """关闭线程池；已取消时不等待卡住的任务，并丢弃尚未开始的任务"""
+    executor.shutdown(wait=not cancelled, cancel_futures=cancelled)
+
+
+def pick_preferred_option(labels):
+    """按"非常满意" > "满意" > 第一个选项的顺序，返回应选择的选项下标"""
+    satisfied = None
+    for i, label in enumerate(labels):
+        if "非常满意" in label:
+            return i
+        if satisfied is None and "满意" in label and "非常" not in label:
+            satisfied = i
+    return satisfied if satisfied is not None else 0
+
+
+class QuestionnaireSchemaCache:
+    """问卷结构缓存：按问卷指纹记录每组单选项应选择的下标，同一学期的问卷只需识别一次标签
+
+    指纹由每组的name和全部选项value计算，页面结构变化时指纹不同，旧缓存自然失效。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.schemas = {}  # 指纹 -> {'signature': ..., 'choices': {name: 下标}}
+        self.lock = threading.Lock()
+        self.hits = 0  # 直接按缓存填写的次数
+        self.learned = 0  # 重新识别标签并写入缓存的次数
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.schemas = json.load(f)
+                print(f"已加载 {len(self.schemas)} 份问卷结构缓存")
+            except (OSError, ValueError) as e:
+                print(f"读取问卷结构缓存时出错: {e}")
+
+    @staticmethod
+    def fingerprint(signature):
+        return hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]
+
+    def get(self, signature):
+        """返回与签名一致的缓存选择，没有时返回None"""
+        with self.lock:
+            schema = self.schemas.get(self.fingerprint(signature))
+            if schema and schema['signature'] == signature:
+                return schema['choices']
+        return None
+
+    def all_schemas(self):
+        """返回全部缓存，供页面脚本按签名匹配"""
+        with self.lock:
+            return list(self.schemas.values())
+
+    def record(self, signature, choices, from_cache):
+        """记录一次填写结果，未命中缓存时写入新结构"""
+        with self.lock:
+            if from_cache:
+                self.hits += 1
+                return
+            self.learned += 1
+            self.schemas[self.fingerprint(signature)] = {'signature': signature, 'choices': choices}
+            schemas = dict(self.schemas)
+        if self.path:
+            try:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(schemas, f, ensure_ascii=False, indent=2)
+            except OSError as e:
+                print(f"保存问卷结构缓存时出错: {e}")
+
+
+class EvaluationCheckpoint:
+    """评估进度检查点：按账号和(课程, 教师)记录每门课程的状态和填写次数
+
+    哪些课程需要评估以每次运行时读取的评估列表为准；检查点只记录每门课程已经填写提交了几次（attempts），
+    跨多次运行累计，次数用完的课程不再评估，避免服务器一直不接受的课程在每次运行中反复提交。
+    状态依次为filled（已填写，等待提交）、submitted（服务器已接受提交）、confirmed（评估列表显示已评估），
+    unconfirmed表示评估列表仍显示未评估。
+    每次更新都会写入文件，写入时先写临时文件再替换，避免中断时留下损坏的文件。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.accounts = {}  # 学号 -> {"课程||教师": {'status': ..., 'updated': ..., 'attempts': ...}}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.accounts = json.load(f)
+                print(f"已加载评估进度检查点: {path}")
+            except (OSError, ValueError) as e:
+                print(f"读取评估进度检查点时出错: {e}")
+
+    @staticmethod
+    def course_key(course_info):
+        return f"{course_info['course_name']}||{course_info['teacher']}"
+
+    def attempts(self, account, course_info):
+        """返回课程已经填写提交的次数"""
+        with self.lock:
+            entry = self.accounts.get(account, {}).get(self.course_key(course_info))
+            return entry['attempts'] if entry else 0
+
+    def record(self, account, course_info, status):
+        """更新课程状态并写入文件"""
+        with self.lock:
+            entry = self.accounts.setdefault(account, {}).setdefault(
+                self.course_key(course_info), {'status': None, 'attempts': 0})
+            if status == 'filled':
+                entry['attempts'] += 1
+            entry['status'] = status
+            entry['updated'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._save_locked()
+
+    def reconcile(self, account, courses):
+        """用刚解析的评估列表核对检查点，以评估列表为准：列表显示已评估的记为confirmed；
+        列表仍显示未评估、检查点却记为已提交的，说明提交没有生效，改记为unconfirmed并重新评估
+
+        返回检查点记为已提交、但评估列表仍显示未评估的课程列表。
+        """
+        unconfirmed = []
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock:
+            entries = self.accounts.setdefault(account, {})
+            for course_info in courses:
+                key = self.course_key(course_info)
+                entry = entries.get(key)
+                if course_info['status'] == '是':
+                    if not entry or entry['status'] != 'confirmed':
+                        entries[key] = {'status': 'confirmed', 'attempts': entry['attempts'] if entry else 0,
+                                        'updated': now}
+                elif entry and entry['status'] in ('submitted', 'confirmed'):
+                    entries[key] = {'status': 'unconfirmed', 'attempts': entry['attempts'], 'updated': now}
+                    unconfirmed.append(course_info)
+            self._save_locked()
+        return unconfirmed
+
+    def _save_locked(self):
+        if not self.path:
+            return
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.accounts, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"保存评估进度检查点时出错: {e}")
+
+
+def parse_onclick_args(onclick):
+    """解析onclick中函数调用的参数，如 evaluation('a','b') -> ['a', 'b']"""
+    match = re.search(r"\((.*?)\)", onclick or "", re.S)
+    if not match:
+        return []
+    args = re.findall(r"'([^']*)'|\"([^\"]*)\"|([^,\s]+)", match.group(1))
+    return [single or double or bare for single, double, bare in args]
+
+
+class HttpSession:
+    """轻量HTTP会话：按主机复用keep-alive连接，自动处理Cookie和重定向"""
+
+    def __init__(self, timeout=10, profiler=None):
+        self.timeout = timeout
+        self.profiler = profiler
+        self.cookie_jar = http.cookiejar.CookieJar()
+        self.idle_connections = {}  # (协议, 主机) -> 空闲连接列表
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.bytes_received = 0
+
+    def request(self, method, url, data=None):
+        """发送请求并跟随重定向，返回(状态码, 最终URL, 响应文本)"""
+        body = urllib.parse.urlencode(data).encode('utf-8') if data is not None else None
+        for _ in range(10):
+            status, headers, content = self._send(method, url, body)
+            location = headers.get('Location')
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urllib.parse.urljoin(url, location)
+                if status in (301, 302, 303):
+                    method, body = 'GET', None
+                continue
+            charset = headers.get_content_charset() or 'utf-8'
+            return status, url, content.decode(charset, errors='replace')
+        raise RuntimeError(f"重定向次数过多: {url}")
+
+    def get(self, url):
+        return self.request('GET', url)
+
+    def post(self, url, data):
+        return self.request('POST', url, data)
+
+    def _get_connection(self, scheme, netloc):
+        """取出空闲连接，没有时新建，返回(连接, 是否复用)"""
+        with self.lock:
+            idle = self.idle_connections.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout,
+                                               context=ssl._create_unverified_context()), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def _send(self, method, url, body):
+        """发送单个请求，复用的连接被服务器关闭时重试一次"""
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        cookie_request = urllib.request.Request(url, method=method)
+        self.cookie_jar.add_cookie_header(cookie_request)
+        headers = {'User-Agent': 'Mozilla/5.0', 'Connection': 'keep-alive'}
+        headers.update(cookie_request.unredirected_hdrs)
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        start_time = time.time()
+        while True:
+            connection, reused = self._get_connection(parts.scheme, parts.netloc)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if not reused:
+                    raise
+            except Exception:
+                connection.close()
+                raise
+
+        self.cookie_jar.extract_cookies(response, cookie_request)
+        elapsed = time.time() - start_time
+        SERVER_LATENCY.add(elapsed)
+        if self.profiler and self.profiler.enabled:
+            self.profiler.record_command(f"http {method}", {'url': path}, elapsed)
+        with self.lock:
+            self.request_count += 1
+            self.bytes_received += len(content)
+            if response.will_close:
+                connection.close()
+            else:
+                self.idle_connections.setdefault((parts.scheme, parts.netloc), []).append(connection)
+        return response.status, response.headers, content
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self.lock:
+            for connections in self.idle_connections.values():
+                for connection in connections:
+                    connection.close()
+            self.idle_connections = {}
+
+
+class EvaluationPageParser(HTMLParser):
+    """解析教务系统页面中的表单、评估课程表格和问卷单选项"""
+
+    # 遇到这些标签结束时停止收集单选项的标签文本
+    LABEL_END_TAGS = {'label', 'div', 'td', 'tr', 'li', 'p'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.page_form = self._new_form({})  # 不在任何<form>中的字段
+        self.forms = []
+        self.course_rows = []  # jxpgtbody中的行: {'cells': [...], 'button_id': ..., 'onclick': ...}
+        self.has_login_form = False
+        self._form = None
+        self._radio = None  # 正在收集标签文本的单选项
+        self._textarea = None
+        self._in_course_tbody = False
+        self._row = None
+        self._cell = None
+
+    @staticmethod
+    def _new_form(attrs):
+        return {
+            'id': attrs.get('id') or attrs.get('name') or '',
+            'action': attrs.get('action') or '',
+            'method': (attrs.get('method') or 'get').lower(),
+            'fields': [],  # 普通字段: [(name, value)]
+            'radios': [],  # 单选项: {'name', 'value', 'label'}
+            'textareas': {},  # 文本框: name -> 内容
+        }
+
+    @property
+    def current_form(self):
+        return self._form if self._form is not None else self.page_form
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {key: value or '' for key, value in attrs}
+        if attrs.get('id') == 'J-login-btn':
+            self.has_login_form = True
+
+        if tag == 'form':
+            self._form = self._new_form(attrs)
+            self.forms.append(self._form)
+        elif tag == 'input':
+            self._radio = None
+            input_type = attrs.get('type', 'text').lower()
+            name = attrs.get('name')
+            if input_type == 'radio' and name:
+                self._radio = {'name': name, 'value': attrs.get('value', 'on'), 'label': ''}
+                self.current_form['radios'].append(self._radio)
+            elif input_type == 'checkbox':
+                if name and 'checked' in attrs:
+                    self.current_form['fields'].append((name, attrs.get('value', 'on')))
+            elif name and input_type not in ('button', 'submit', 'reset', 'image', 'file'):
+                self.current_form['fields'].append((name, attrs.get('value', '')))
+        elif tag == 'textarea' and attrs.get('name'):
+            self._textarea = attrs['name']
+            self.current_form['textareas'][self._textarea] = ''
+        elif tag == 'tbody' and attrs.get('id') == 'jxpgtbody':
+            self._in_course_tbody = True
+        elif tag == 'tr' and self._in_course_tbody:
+            self._row = {'cells': [], 'button_id': '', 'onclick': ''}
+        elif tag == 'td' and self._row is not None:
+            self._cell = []
+        elif tag == 'button' and self._row is not None and not self._row['onclick']:
+            self._row['button_id'] = attrs.get('id', '')
+            self._row['onclick'] = attrs.get('onclick', '')
+        elif tag == 'br':
+            self._radio = None
+
+    def handle_endtag(self, tag):
+        if tag in self.LABEL_END_TAGS:
+            self._radio = None
+        if tag == 'form':
+            self._form = None
+        elif tag == 'textarea':
+            self._textarea = None
+        elif tag == 'td' and self._cell is not None and self._row is not None:
+            self._row['cells'].append(''.join(self._cell).strip())
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.course_rows.append(self._row)
+            self._row = None
+        elif tag == 'tbody':
+            self._in_course_tbody = False
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+        if self._radio is not None:
+            self._radio['label'] += data.strip()
+        if self._textarea is not None:
+            self.current_form['textareas'][self._textarea] += data
+
+    def questionnaire_form(self):
+        """返回包含单选项的问卷表单"""
+        for form in self.forms + [self.page_form]:
+            if form['radios']:
+                return form
+        return None
+
+    def evaluation_form(self):
+        """返回评估列表页中评估按钮用来提交课程参数的表单"""
+        post_forms = [form for form in self.forms if form['method'] == 'post' and form['fields']]
+        for form in post_forms:
+            if 'evaluation' in form['id'].lower() or 'evaluation' in form['action'].lower():
+                return form
+        return post_forms[0] if post_forms else None
+
+
+def parse_page(html):
+    """解析页面HTML"""
+    parser = EvaluationPageParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+def resolve_evaluation_target(page_url, evaluation_form, onclick):
+    """把评估按钮的onclick参数按顺序映射到评估表单字段，得到问卷请求{'url', 'method', 'params'}"""
+    args = parse_onclick_args(onclick)
+    if evaluation_form:
+        names = [name for name, _ in evaluation_form['fields']]
+        params = dict(evaluation_form['fields'])
+        params.update(zip(names, args))
+        return {
+            'url': urllib.parse.urljoin(page_url, evaluation_form['action'] or page_url),
+            'method': evaluation_form['method'],
+            'params': params,
+        }
+    # 没有评估表单时，onclick参数中的链接即为问卷地址
+    for arg in args:
+        if arg.startswith('/') or arg.startswith('http'):
+            return {'url': urllib.parse.urljoin(page_url, arg), 'method': 'get', 'params': {}}
+    return None
+
+
+class HttpEvaluationEngine:
+    """无浏览器的HTTP引擎：用纯HTTP请求完成登录、解析课程列表、加载问卷和提交"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.session = HttpSession(timeout=bot.config['http_timeout'], profiler=bot.profiler)
+        self.evaluation_page = None  # 最近一次获取的评估列表: (页面地址, 评估按钮提交的表单)
+
+    def build_login_payload(self, form):
+        """根据登录页表单构造登录请求参数"""
+        payload = dict(form['fields'])
+        payload['username'] = self.bot.student_id
+        payload['passwordOld'] = self.bot.password
+        if 'password' in payload:
+            payload['password'] = self.bot.password
+        return payload
+
+    @staticmethod
+    def check_status(status, url):
+        """服务器返回5xx时抛出StageError，由阶段的重试策略决定是否重试"""
+        if status >= 500:
+            raise StageError(f"服务器返回 {status}: {url}")
+
+    def login(self):
+        """提交登录表单，登录后不再出现登录按钮视为成功；提交后仍显示登录表单时抛出LoginRejected"""
+        print("正在通过HTTP登录...")
+        status, page_url, html = self.session.get(self.bot.login_url)
+        self.check_status(status, page_url)
+        page = parse_page(html)
+        if not page.has_login_form:
+            print("已处于登录状态")
+            return True
+        form = next((form for form in page.forms if 'username' in dict(form['fields'])), page.page_form)
+        action = urllib.parse.urljoin(page_url, form['action'] or page_url)
+        status, _, html = self.session.post(action, self.build_login_payload(form))
+        self.check_status(status, action)
+        with self.bot.lock:
+            self.bot.login_count += 1
+        if parse_page(html).has_login_form:
+            self.bot.reject_login("HTTP登录失败，请检查学号和密码")
+        print("HTTP登录成功")
+        return True
+
+    def parse_course_table(self):
+        """获取评估列表页并解析jxpgtbody中的课程行"""
+        try:
+            rows = self.fetch_course_rows()
+            if rows is None:
+                return False
+            self.bot.load_course_rows(rows)
+            self.resolve_targets(self.bot.course_dict.values())
+            return True
+        except Exception as e:
+            print(f"解析课程表格时出错: {e}")
+            return False
+
+    def fetch_course_rows(self):
+        """获取评估列表页，返回课程行列表，登录状态失效时返回None"""
+        _, page_url, html = self.session.get(self.bot.evaluation_index_url)
+        page = parse_page(html)
+        if page.has_login_form:
+            print("获取评估列表时登录状态已失效")
+            return None
+        self.evaluation_page = (page_url, page.evaluation_form())
+        rows = []
+        for i, row in enumerate(page.course_rows):
+            cells = row['cells'] + [''] * (5 - len(row['cells']))
+            rows.append({
+                'row': i,
+                'teacher': cells[2],
+                'course_name': cells[3],
+                'status': cells[4],
+                'button_id': row['button_id'],
+                'onclick': row['onclick'],
+            })
+        return rows
+
+    def resolve_targets(self, courses):
+        """把最近一次获取的评估列表中的评估按钮映射为问卷请求"""
+        page_url, evaluation_form = self.evaluation_page
+        for course_info in courses:
+            course_info['target'] = resolve_evaluation_target(page_url, evaluation_form, course_info['onclick'])
+
+    def open_questionnaire(self, course_info, session_num):
+        """加载课程问卷并构造提交参数；重试也不会成功时返回None，服务器错误和网络错误抛出异常交给重试策略"""
+        target = course_info.get('target')
+        if not target:
+            print(f"评估会话 {session_num}: 课程 {course_info['course_name']} 没有可用的评估入口")
+            return None
+        if target['method'] == 'post':
+            status, page_url, html = self.session.post(target['url'], target['params'])
+        else:
+            url = target['url']
+            if target['params']:
+                url += ('&' if '?' in url else '?') + urllib.parse.urlencode(target['params'])
+            status, page_url, html = self.session.get(url)
+        self.check_status(status, page_url)
+        form = parse_page(html).questionnaire_form()
+        if not form:
+            print(f"评估会话 {session_num}: 课程 {course_info['course_name']} 的问卷中没有找到选项")
+            return None
+
+        # 按name分组，结构已缓存时直接使用缓存的选择，否则按标签选择最满意的选项
+        payload = dict(form['fields'])
+        groups = {}
+        for radio in form['radios']:
+            groups.setdefault(radio['name'], []).append(radio)
+        signature = ";".join(f"{name}=" + ",".join(radio['value'] for radio in radios)
+                             for name, radios in groups.items())
+        schema_cache = self.bot.schema_cache
+        choices = schema_cache.get(signature)
+        from_cache = choices is not None
+        if not from_cache:
+            choices = {name: pick_preferred_option([radio['label'] for radio in radios])
+                       for name, radios in groups.items()}
+        schema_cache.record(signature, choices, from_cache)
+        for name, radios in groups.items():
+            payload[name] = radios[choices[name]]['value']
+        payload.update(form['textareas'])
+        payload['zgpj'] = EVALUATION_TEXT
+        self.bot.log(session_num, f"找到 {len(groups)} 个问题组，已构造课程 {course_info['course_name']} 的问卷")
+
+        with self.bot.lock:
+            course_info['evaluation_completed'] = True
+            course_info['filled_at'] = time.time()
+            self.bot.completed_evaluations += 1
+        self.bot.checkpoint.record(self.bot.student_id, course_info, 'filled')
+        return {'url': urllib.parse.urljoin(page_url, form['action'] or page_url), 'payload': payload}
+
+    def submit(self, course_info, session_num, submission):
+        """提交问卷，服务器返回JSON时以result字段判断是否成功；服务器拒绝时返回False，5xx和网络错误抛出异常交给重试策略"""
+        self.bot.log(session_num, f"正在提交课程 {course_info['course_name']} 的评估...")
+        status, _, text = self.session.post(submission['url'], submission['payload'])
+        self.check_status(status, submission['url'])
+        success = status == 200
+        try:
+            result = json.loads(text)
+            if isinstance(result, dict) and 'result' in result:
+                success = success and result['result'] in ('ok', 'success', True)
+        except ValueError:
+            pass
+        if success:
+            with self.bot.lock:
+                course_info['evaluated'] = True
+                course_info['submitted'] = True
+            self.bot.checkpoint.record(self.bot.student_id, course_info, 'submitted')
+            self.bot.log(session_num, f"✓ 已成功提交课程 {course_info['course_name']} 的评估")
+        else:
+            print(f"评估会话 {session_num}: ✗ 提交课程 {course_info['course_name']} 的评估失败: {text[:100]}")
+        return success
+
+    def plan_evaluation(self, courses_to_evaluate):
+        """返回交给调度器的(打开表单, 提交表单, 线程池, 同时进行的课程数)，等待期间不占用线程"""
+        print("\n使用HTTP引擎评估，不启动浏览器")
+        profiler = self.bot.profiler
+
+        retry = self.bot.retry
+
+        def open_form(course_info, session_num):
+            with profiler.phase('fill', session_num):
+                return retry.run('open', session_num, lambda: self.open_questionnaire(course_info, session_num))
+
+        def submit_form(course_info, session_num, submission):
+            profiler.record_phase('wait', session_num, time.time() - course_info['filled_at'])
+            with profiler.phase('submit', session_num):
+                return retry.run('submit', session_num, lambda: self.submit(course_info, session_num, submission))
+
+        return open_form, submit_form, None, len(courses_to_evaluate)
+
+    def close(self):
+        self.session.close()
+
+
+class FixedLaunchPolicy:
+    """固定的启动策略：相邻会话的启动间隔，以及同时进行中的课程数上限"""
+
+    def __init__(self, interval, max_in_flight):
+        self.interval = interval
+        self.max_in_flight = max_in_flight
+
+    def observe(self, latency, error):
+        """固定策略不根据观测结果调整"""
+        return False
+
+    def record_timeout(self, step, elapsed):
+        pass
+
+    def print_summary(self):
+        pass
+
+
+class AdaptiveLaunchPolicy:
+    """自适应启动策略：根据打开表单时等待服务器的延迟和失败率调整同时进行的课程数和启动间隔
+
+    每收集window次观测做一次决定：失败率超过上限或平均延迟超过目标的两倍时并发减半、间隔加倍；
+    没有失败且延迟低于目标时并发加一、间隔缩短四分之一；其余情况保持不变。调整结果限制在配置的范围内。
+    """
+
+    def __init__(self, interval, max_in_flight, interval_range, in_flight_range, target_latency,
+                 window=5, max_error_rate=0.2):
+        self.min_interval, self.max_interval = interval_range
+        self.min_in_flight = max(1, in_flight_range[0])
+        self.max_in_flight_limit = in_flight_range[1] or max_in_flight
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        # 从上限的一半开始，根据观测结果逐步增加或减少
+        self.max_in_flight = max(self.min_in_flight, (self.max_in_flight_limit + 1) // 2)
+        self.target_latency = target_latency
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.latencies = []
+        self.errors = 0
+        self.observations = 0
+        self.started = time.time()
+        self.decisions = []  # (时间, 并发, 启动间隔)，供总结和基准查看
+        self.lock = threading.Lock()
+
+    def observe(self, latency, error):
+        """记录一次观测（latency为None时只计入错误），达到窗口大小时调整策略，发生调整时返回True"""
+        with self.lock:
+            self.observations += 1
+            if latency is not None:
+                self.latencies.append(latency)
+            if error:
+                self.errors += 1
+            if self.observations < self.window:
+                return False
+            return self._decide_locked()
+
+    def record_timeout(self, step, elapsed):
+        """条件等待超时计为一次错误；确认对话框超时属于正常情况，不计入"""
+        if step != 'dialog':
+            self.observe(None, True)
+
+    def _decide_locked(self):
+        average = sum(self.latencies) / len(self.latencies) if self.latencies else 0
+        error_rate = self.errors / self.observations
+        old_in_flight, old_interval = self.max_in_flight, self.interval
+        if error_rate > self.max_error_rate or average > self.target_latency * 2:
+            self.max_in_flight = max(self.min_in_flight, self.max_in_flight // 2)
+            self.interval = min(self.max_interval, self.interval * 2)
+            action = "降低并发"
+        elif not self.errors and average < self.target_latency:
+            self.max_in_flight = min(self.max_in_flight_limit, self.max_in_flight + 1)
+            self.interval = max(self.min_interval, self.interval * 0.75)
+            action = "提高并发"
+        else:
+            action = "保持"
+        self.latencies = []
+        self.errors = 0
+        self.observations = 0
+        self.decisions.append((time.time(), self.max_in_flight, self.interval))
+        print(f"自适应调度: 平均延迟 {average:.2f} 秒, 错误率 {error_rate:.0%}, {action}, "
+              f"并发 {old_in_flight}→{self.max_in_flight}, 启动间隔 {old_interval:.1f}→{self.interval:.1f} 秒")
+        return (self.max_in_flight, self.interval) != (old_in_flight, old_interval)
+
+    def print_summary(self):
+        """打印每次调整后的并发和启动间隔"""
+        with self.lock:
+            decisions = list(self.decisions)
+        if not decisions:
+            return
+        print(f"\n自适应调度: 共调整 {len(decisions)} 次")
+        print(" → ".join(f"{when - self.started:.0f}秒: 并发{in_flight}/间隔{interval:.1f}秒"
+                         for when, in_flight, interval in decisions))
+
+
+def make_launch_policy(config, max_in_flight):
+    """按配置创建启动策略，max_in_flight为执行引擎允许的并发上限"""
+    if not config['adaptive']:
+        return FixedLaunchPolicy(config['launch_interval'], max_in_flight)
+    return AdaptiveLaunchPolicy(
+        config['launch_interval'],
+        max_in_flight,
+        interval_range=config['adaptive_interval_range'],
+        in_flight_range=config['adaptive_in_flight_range'],
+        target_latency=config['adaptive_target_latency'],
+        window=config['adaptive_window'],
+    )
+
+
+class ProgressReporter:
+    """进度视图：评估线程把每门课程的阶段变化放入队列，由一个渲染线程按固定频率打印汇总表格
+
+    表格列出进行中的课程、所处阶段、剩余等待时间和最近一条过程信息，代替各线程各自打印；
+    开启日志时每个事件写一行JSON。
+    """
+
+    STAGE_NAMES = {
+        'queued': "排队", 'opening': "打开中", 'login': "登录", 'navigate': "导航", 'locate': "定位课程",
+        'fill': "填写", 'waiting': "等待提交", 'submit': "提交", 'dialog': "确认对话框",
+        'done': "已完成", 'failed': "失败",
+    }
+    FINISHED_STAGES = ('done', 'failed')
+
+    def __init__(self, interval=10, log_path=None):
+        self.interval = interval
+        self.events = queue.Queue()
+        self.sessions = collections.OrderedDict()  # 会话编号 -> {'course', 'stage', 'deadline', 'note'}，只在渲染线程中修改
+        self.log_file = open(log_path, 'a', encoding='utf-8') if log_path else None
+        self.changed = False
+        self.thread = None
+
+    def start(self):
+        """启动渲染线程，重复调用无影响"""
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """处理完剩余事件，打印最终进度并关闭日志"""
+        if not self.thread:
+            return
+        self.events.put(None)
+        self.thread.join()
+        self.thread = None
+        self.render()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+    def publish(self, session, stage, course=None, deadline=None):
+        """登记一次阶段变化；course只需在课程第一次出现时给出"""
+        self.events.put({'ts': time.time(), 'session': session, 'stage': stage, 'course': course,
+                         'deadline': deadline})
+
+    def note(self, session, message):
+        """登记一条会话的过程信息，在表格中显示为该会话最近的信息"""
+        self.events.put({'ts': time.time(), 'session': session, 'note': message})
+
+    def _run(self):
+        next_render = time.time() + self.interval
+        while True:
+            try:
+                event = self.events.get(timeout=max(next_render - time.time(), 0))
+            except queue.Empty:
+                event = {}
+            if event is None:
+                break
+            if event:
+                self._apply(event)
+            if time.time() >= next_render:
+                next_render = time.time() + self.interval
+                # 没有变化且没有倒计时时不重复打印
+                if self.changed or any(state['stage'] == 'waiting' for state in self.sessions.values()):
+                    self.render()
+
+    def _apply(self, event):
+        state = self.sessions.get(event['session'])
+        if state is None:
+            # 主会话等不是由调度器启动的会话不显示
+            if event.get('course') is None:
+                return
+            state = self.sessions[event['session']] = {'course': event['course'], 'stage': None, 'deadline': None,
+                                                       'note': ""}
+        if 'note' in event:
+            state['note'] = event['note']
+        else:
+            state['stage'] = event['stage']
+            if event['deadline'] is not None:
+                state['deadline'] = event['deadline']
+            self.changed = True
+        if self.log_file:
+            event = {**event, 'course': state['course'], 'ts': round(event['ts'], 3)}
+            if event.get('deadline') is not None:
+                event['deadline'] = round(event['deadline'], 3)
+            self.log_file.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self.log_file.flush()
+
+    def render(self):
+        """一次性打印进度表格，避免与其他线程的输出交错"""
+        self.changed = False
+        if not self.sessions:
+            return
+        now = time.time()
+        counts = collections.Counter(state['stage'] for state in self.sessions.values())
+        active = [(session, state) for session, state in self.sessions.items()
+                  if state['stage'] not in self.FINISHED_STAGES and state['stage'] != 'queued']
+        lines = [f"\n[进度 {time.strftime('%H:%M:%S')}] 完成 {counts['done']}/{len(self.sessions)}, "
+                 f"失败 {counts['failed']}, 进行中 {len(active)}, 排队 {counts['queued']}"]
+        for session, state in active:
+            stage = self.STAGE_NAMES.get(state['stage'], state['stage'])
+            remaining = ""
+            if state['stage'] == 'waiting' and state['deadline']:
+                remaining = f"剩余{max(state['deadline'] - now, 0):.0f}秒"
+            lines.append(f"  {str(session):<12} {state['course']:<20} {stage:<8} {remaining:<10} {state['note'][:40]}")
+        print("\n".join(lines))
+
+
+def make_progress_reporter(config):
+    """按配置创建进度视图，未开启时返回None"""
+    if not config['progress_view']:
+        return None
+    return ProgressReporter(config['progress_interval'], config['progress_log_path'])
+
+
+class EvaluationScheduler:
+    """事件驱动的评估调度器
+
+    用定时器堆管理会话启动和提交截止时间：表单填写完成后只登记截止时间并释放工作线程，
+    到期后再把提交任务交给线程池，等待期间不占用任何线程。
+    可以同时调度多个账号：同时进行的课程总数受启动策略限制，账号之间按轮转顺序交替启动，
+    启动间隔按账号分别计算。
+    """
+
+    def __init__(self, executor, policy, wait_seconds, report_interval=30, cancel_event=None):
+        self.executor = executor
+        self.policy = policy
+        self.wait_seconds = wait_seconds
+        self.report_interval = report_interval
+        self.timers = []  # 定时器堆: (触发时间, 序号, 函数, 参数, 线程池)，线程池为None时在调度线程中直接执行
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.accounts = collections.OrderedDict()  # 账号 -> 调度状态，按轮转顺序排列
+        self.deadlines = {}  # 等待提交的会话编号 -> 截止时间
+        self.in_flight = 0  # 所有账号已启动但尚未结束的课程数
+        self.running_tasks = 0  # 已交给线程池但尚未结束的任务数
+        self.launch_scheduled = False
+        self.admission = None  # 准入判断函数 () -> bool，返回False时推迟启动，如内存不足
+        self.admission_retry = 2  # 推迟启动后重新判断的间隔（秒）
+        self.cancel_event = cancel_event or threading.Event()  # 置位后丢弃尚未启动和尚未提交的课程
+        self.progress = None  # 进度视图，为None时每隔report_interval秒打印等待提交的会话
+
+    def schedule(self, when, func, *args):
+        """登记一个在指定时间交给线程池执行的任务"""
+        self._push(when, func, args, self.executor)
+
+    def _publish(self, session_num, stage, **details):
+        if self.progress:
+            self.progress.publish(session_num, stage, **details)
+
+    def _push(self, when, func, args, executor):
+        with self.condition:
+            heapq.heappush(self.timers, (when, next(self.sequence), func, args, executor))
+            self.condition.notify()
+
+    def add(self, courses, open_form, submit_form, account=None, executor=None, max_in_flight=None,
+            on_done=None, first_session=1):
+        """加入一个账号的课程
+
+        open_form(course_info, session_num) 打开并填写表单，返回提交时需要的句柄，失败返回None；
+        submit_form(course_info, session_num, handle) 负责提交并清理。
+        executor和max_in_flight为该账号专用的线程池和同时进行的课程数上限，默认使用调度器的设置；
+        on_done() 在该账号的课程全部结束后调用；first_session为第一门课程的会话编号。
+        """
+        if account is None:
+            sessions = list(enumerate(courses, first_session))
+        else:
+            sessions = [(f"{account}-{num}", course) for num, course in enumerate(courses, first_session)]
+        for session_num, course_info in sessions:
+            self._publish(session_num, 'queued', course=course_info['course_name'])
+        with self.condition:
+            self.accounts[account] = {
+                'pending': collections.deque(sessions),  # 尚未启动的课程: (会话编号, 课程信息)
+                'open_form': open_form,
+                'submit_form': submit_form,
+                'executor': executor or self.executor,
+                'max_in_flight': max_in_flight or self.policy.max_in_flight,
+                'in_flight': 0,
+                'last_launch': 0,
+                'on_done': on_done,
+            }
+            if not courses:
+                self.accounts.pop(account)
+            self._schedule_launch_locked()
+        if not courses and on_done:
+            on_done()
+
+    def run(self, courses, open_form, submit_form):
+        """调度单个账号的所有课程直到全部结束"""
+        self.add(courses, open_form, submit_form)
+        self.run_until_done()
+
+    def run_until_done(self):
+        """处理定时器直到没有待执行和正在执行的任务"""
+        next_report = time.time() + self.report_interval
+        while True:
+            task = None
+            with self.condition:
+                if self.cancel_event.is_set():
+                    # 正在执行的任务会因等待被取消或浏览器被关闭而很快结束，不再等待它们
+                    dropped = sum(len(state['pending']) for state in self.accounts.values()) + len(self.deadlines)
+                    self.timers.clear()
+                    self.deadlines.clear()
+                    print(f"评估已取消，放弃 {dropped} 门未启动或未提交的课程")
+                    break
+                if not self.timers and self.running_tasks == 0:
+                    break
+                now = time.time()
+                if self.timers and self.timers[0][0] <= now:
+                    _, _, func, args, executor = heapq.heappop(self.timers)
+                    if executor:
+                        self.running_tasks += 1
+                    task = (func, args, executor)
+                else:
+                    # 至少每秒检查一次取消事件
+                    wake_time = min(self.timers[0][0], next_report) if self.timers else next_report
+                    self.condition.wait(min(max(wake_time - now, 0), 1))
+
+            if task:
+                func, args, executor = task
+                if executor:
+                    executor.submit(self._run_task, func, args)
+                else:
+                    func(*args)
+            elif time.time() >= next_report:
+                next_report = time.time() + self.report_interval
+                if not self.progress:
+                    self.report()
+
+    def report(self):
+        """汇报等待提交的会话"""
+        with self.condition:
+            deadlines = sorted(self.deadlines.items(), key=lambda item: item[1])
+        if deadlines:
+            now = time.time()
+            remaining = ", ".join(f"会话{num}剩余{max(int(deadline - now), 0)}秒" for num, deadline in deadlines)
+            print(f"等待提交: {remaining}")
+
+    def _run_task(self, func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"调度任务执行出错: {e}")
+        finally:
+            with self.condition:
+                self.running_tasks -= 1
+                self.condition.notify()
+
+    def _next_account_locked(self, now):
+        """按轮转顺序找出下一个可以启动课程的账号，返回(账号, 可启动时间)，没有时返回(None, None)"""
+        earliest = (None, None)
+        for account, state in self.accounts.items():
+            if not state['pending'] or state['in_flight'] >= state['max_in_flight']:
+                continue
+            ready = max(now, state['last_launch'] + self.policy.interval)
+            if ready <= now:
+                return account, ready
+            if earliest[1] is None or ready < earliest[1]:
+                earliest = (account, ready)
+        return earliest
+
+    def _schedule_launch_locked(self):
+        """按启动策略登记下一次启动（调用方需持有condition）"""
+        if self.launch_scheduled or self.in_flight >= self.policy.max_in_flight:
+            return
+        account, when = self._next_account_locked(time.time())
+        if when is None:
+            return
+        heapq.heappush(self.timers, (when, next(self.sequence), self._launch, (), None))
+        self.launch_scheduled = True
+        self.condition.notify()
+
+    def _launch(self):
+        """在调度线程中挑选下一门课程，交给所属账号的线程池打开并填写"""
+        with self.condition:
+            self.launch_scheduled = False
+            if self.cancel_event.is_set():
+                return
+            account, ready = self._next_account_locked(time.time())
+            if self.in_flight < self.policy.max_in_flight and ready is not None and ready <= time.time():
+                # 没有进行中的课程时总是放行，避免永远无法启动
+                if self.in_flight and self.admission and not self.admission():
+                    heapq.heappush(self.timers, (time.time() + self.admission_retry, next(self.sequence),
+                                                 self._launch, (), None))
+                    self.launch_scheduled = True
+                    return
+                state = self.accounts[account]
+                self.accounts.move_to_end(account)  # 轮转到队尾，保证账号之间公平交替
+                session_num, course_info = state['pending'].popleft()
+                state['in_flight'] += 1
+                state['last_launch'] = time.time()
+                self.in_flight += 1
+                self.running_tasks += 1
+                self._publish(session_num, 'opening')
+                state['executor'].submit(self._run_task, self._open, (account, session_num, course_info))
+            self._schedule_launch_locked()
+
+    def _open(self, account, session_num, course_info):
+        """打开并填写表单，然后登记提交截止时间"""
+        state = self.accounts[account]
+        handle = None
+        SERVER_LATENCY.begin()
+        try:
+            handle = state['open_form'](course_info, session_num)
+        except Exception as e:
+            print(f"评估会话 {session_num} 处理课程 {course_info['course_name']} 时出错: {e}")
+        # 只把等待服务器的时间和结果交给启动策略，借出浏览器和重试退避不计入，自适应策略据此调整并发和启动间隔
+        self.policy.observe(SERVER_LATENCY.end(), handle is None)
+        if handle is None:
+            self._publish(session_num, 'failed')
+            self._finish(account)
+            return
 
-        self.main_driver = webdriver.Chrome(options=self.chrome_options)
-        self.wait = WebDriverWait(self.main_driver, 10)
+        deadline = time.time() + self.wait_seconds
+        with self.condition:
+            self.deadlines[session_num] = deadline
+            self._schedule_launch_locked()
+        # 开启进度视图时剩余等待时间由表格统一显示
+        self._publish(session_num, 'waiting', deadline=deadline)
+        if not self.progress:
+            print(f"评估会话 {session_num}: 开始独立等待{self.wait_seconds}秒...")
+        self._push(deadline, self._submit, (account, session_num, course_info, handle), state['executor'])
+
+    def _submit(self, account, session_num, course_info, handle):
+        """截止时间到达后提交表单"""
+        with self.condition:
+            self.deadlines.pop(session_num, None)
+        self._publish(session_num, 'submit')
+        try:
+            self.accounts[account]['submit_form'](course_info, session_num, handle)
+        except Exception as e:
+            print(f"评估会话 {session_num} 处理课程 {course_info['course_name']} 时出错: {e}")
+        finally:
+            self._publish(session_num, 'done' if course_info.get('evaluated') else 'failed')
+            self._finish(account)
+
+    def _finish(self, account):
+        """一门课程结束，腾出名额后登记下一次启动；账号的课程全部结束时调用其on_done"""
+        on_done = None
+        with self.condition:
+            state = self.accounts[account]
+            state['in_flight'] -= 1
+            self.in_flight -= 1
+            if not state['pending'] and state['in_flight'] == 0:
+                self.accounts.pop(account)
+                on_done = state['on_done']
+            self._schedule_launch_locked()
+        if on_done:
+            try:
+                on_done()
+            except Exception as e:
+                print(f"账号 {account} 收尾时出错: {e}")
+
+
+class TeachingEvaluationBot:
+    def __init__(self, config=None, schema_cache=None, checkpoint=None, memory_governor=None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+
+        self.lock = threading.Lock()  # 线程锁
+
+        # 浏览器登记和取消事件：Ctrl+C时所有等待立即结束，所有浏览器都会被关闭
+        self.registry = DRIVER_REGISTRY
+        self.cancel_event = self.registry.cancel_event
+        self.registry.install_handlers()
+        if self.config['sweep_stale_drivers']:
+            self.registry.sweep_stale()
+
+        # 设置Chrome选项
+        self.chrome_options = self.build_chrome_options()
+        self.free_cache_slots = []  # 已释放、可以复用的浏览器缓存子目录编号
+        self.next_cache_slot = 0
+
+        # 教务系统地址
+        base_url = self.config['base_url'].rstrip('/')
+        self.base_url = base_url
+        self.login_url = base_url + LOGIN_PATH
+        self.evaluation_index_url = base_url + EVALUATION_INDEX_PATH
+
+        # 性能分析层
+        self.profiler = CommandProfiler(self.config['profile'], self.config['profile_events_path'])
+
+        # http引擎不需要启动浏览器
+        self.http_engine = HttpEvaluationEngine(self) if self.config['engine'] == 'http' else None
+        # 内存调度，批量模式下由所有账号共用，由批量运行器启动和报告
+        self.owns_memory_governor = memory_governor is None
+        self.memory_governor = memory_governor or make_memory_governor(self.config)
+        if self.memory_governor and self.owns_memory_governor:
+            self.memory_governor.start()
+        self.main_driver = None
+        if not self.http_engine:
+            self.main_driver = self.new_browser('主浏览器')
+        self.waits = WaitStrategy(self.config['wait_timeouts'], cancel_event=self.cancel_event)  # 条件等待层
+        self.retry = StageRetry(self.config['retry_policies'], cancel_event=self.cancel_event)  # 分阶段重试
         self.course_dict = {}
+        self.course_index = {}  # (课程名称, 教师) -> 课程信息，主会话和评估会话共用
+        # 问卷结构缓存，批量模式下由所有账号共用
+        self.schema_cache = schema_cache or QuestionnaireSchemaCache(self.config['schema_cache_path'])
+        # 评估进度检查点，批量模式下由所有账号共用
+        self.checkpoint = checkpoint or EvaluationCheckpoint(self.config['checkpoint_path'])
+        self.progress = None  # 进度视图，调度期间评估会话的过程信息交给它显示
         self.student_id = ""
         self.password = ""
 
+        # 会话共享相关变量
+        self.shared_cookies = []  # 主会话登录后导出的Cookie
+        self.main_session_ready = threading.Event()  # 主会话登录完成（或失败）后置位，提前预热的浏览器在此等待Cookie
+        self.main_session_ready.set()
+        self.main_session_failed = False  # 主会话登录失败，预热的浏览器不再登录
+        self.password_rejected = False  # 登录页拒绝了学号或密码，所有会话都不再提交登录表单
+        self.login_count = 0  # 在登录页提交账号密码的次数
+        self.shared_session_hits = 0  # 注入Cookie后直接可用的会话数
+        self.shared_session_fallbacks = 0  # 注入Cookie被拒绝后回退登录的会话数
+        self.deep_link_enabled = self.config['deep_link']  # 问卷地址映射有误时整个bot停止直接打开问卷
+        self.deep_link_hits = 0  # 直接打开问卷的次数
+        self.deep_link_fallbacks = 0  # 直接打开失败后回退到评估列表点击的次数
+        self.launch_policy = None  # 最近一次调度使用的启动策略，批量模式下由批量运行器持有
+
         # 并行执行相关变量
-        self.thread_pool = ThreadPoolExecutor(max_workers=10)  # 增加并发数
+        self.thread_pool = ThreadPoolExecutor(max_workers=self.config['max_workers'])
         self.completed_evaluations = 0  # 完成的评估数量
-        self.lock = threading.Lock()  # 线程锁
+
+        # 已登录的评估浏览器驱动池
+        self.driver_pool = DriverPool(
+            self.create_evaluation_driver,
+            max_size=self.config['pool_size'],
+            health_check=self.config['pool_health_check'],
+            max_uses=self.config['pool_max_uses'],
+            log=self.log,
+        )
+
+    def build_chrome_options(self, cache_dir=None):
+        """创建Chrome选项；精简浏览器模式下使用无头、eager页面加载和省内存的参数"""
+        options = Options()
+        # 忽略SSL证书错误
+        options.add_argument('--ignore-certificate-errors')
+        options.add_argument('--ignore-ssl-errors')
+        # 可选：无头模式，在配置中开启，精简模式下总是开启
+        if self.config['headless'] or self.config['lean_browser']:
+            options.add_argument('--headless=new')
+        if self.config['lean_browser']:
+            # DOM解析完成即返回，不等待图片等资源
+            options.page_load_strategy = 'eager'
+            for argument in LEAN_CHROME_ARGUMENTS:
+                options.add_argument(argument)
+        if cache_dir:
+            options.add_argument(f'--disk-cache-dir={cache_dir}')
+        return options
+
+    def new_browser(self, name):
+        """启动一个Chrome实例，name用于内存统计
+
+        精简浏览器模式下屏蔽不需要的资源；配置了browser_cache_dir时，每个同时运行的浏览器使用其下的一个
+        子目录作为磁盘缓存（Chrome不支持多个进程同时使用同一个缓存目录），浏览器关闭后子目录留给下一个
+        浏览器复用，页面脚本在多次运行之间都能命中缓存。
+        """
+        if self.cancel_event.is_set():
+            raise EvaluationCancelled("评估已取消，不再启动浏览器")
+        options = self.chrome_options
+        slot = None
+        if self.config['browser_cache_dir']:
+            with self.lock:
+                if self.free_cache_slots:
+                    slot = self.free_cache_slots.pop()
+                else:
+                    slot = self.next_cache_slot
+                    self.next_cache_slot += 1
+            options = self.build_chrome_options(os.path.join(self.config['browser_cache_dir'], f"slot{slot}"))
+        try:
+            driver = webdriver.Chrome(options=options)
+        except Exception:
+            self.release_cache_slot(slot)
+            raise
+
+        # 浏览器关闭时注销登记、归还缓存子目录、停止内存采样
+        self.registry.register(driver)
+        cleanups = [lambda: self.registry.unregister(driver)]
+        if slot is not None:
+            cleanups.append(lambda: self.release_cache_slot(slot))
+        if self.memory_governor:
+            self.memory_governor.track(driver, name)
+            cleanups.append(lambda: self.memory_governor.untrack(driver))
+        original_quit = driver.quit
+
+        def quit():
+            try:
+                original_quit()
+            finally:
+                for cleanup in cleanups:
+                    cleanup()
+
+        driver.quit = quit
+        self.block_unneeded_resources(driver)
+        return self.profiler.attach(driver)
+
+    def release_cache_slot(self, slot):
+        if slot is not None:
+            with self.lock:
+                self.free_cache_slots.append(slot)
+
+    def block_unneeded_resources(self, driver):
+        """精简浏览器模式下通过CDP屏蔽图片、字体、样式表和统计脚本，对当前标签页生效"""
+        if not self.config['lean_browser']:
+            return
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.config['blocked_url_patterns']})
+        except Exception as e:
+            print(f"设置资源屏蔽时出错: {e}")
 
     def login_main(self):
         """主会话登录系统"""
         print("正在打开网站...")
-        self.main_driver.get("http://jwcxk2.aufe.edu.cn/index.jsp")
-        try:
-            # 等待用户名输入框
-            username_input = self.wait.until(
-                EC.presence_of_element_located((By.ID, "username"))
-            )
-            password_input = self.main_driver.find_element(By.ID, "passwordOld")
-
-            # 输入用户名和密码
-            username_input.clear()
-            username_input.send_keys(self.student_id)
-            password_input.clear()
-            password_input.send_keys(self.password)
-            print("已输入用户名和密码")
-
-            # 点击登录按钮
-            login_btn = self.main_driver.find_element(By.ID, "J-login-btn")
-            login_btn.click()
-            print("已点击登录按钮")
-
-            # 等待登录完成
-            time.sleep(3)
-            return True
-        except Exception as e:
-            print(f"登录过程中出错: {e}")
-            return False
+        return self.submit_login_form(self.main_driver)
 
     def login_evaluation_session(self, driver, session_num):
         """评估会话登录系统"""
-        print(f"正在为评估会话 {session_num} 登录...")
-        driver.get("http://jwcxk2.aufe.edu.cn/index.jsp")
-        try:
-            # 等待用户名输入框
-            wait = WebDriverWait(driver, 10)
-            username_input = wait.until(
-                EC.presence_of_element_located((By.ID, "username"))
-            )
-            password_input = driver.find_element(By.ID, "passwordOld")
-
-            # 输入用户名和密码
-            username_input.clear()
-            username_input.send_keys(self.student_id)
-            password_input.clear()
-            password_input.send_keys(self.password)
-            print(f"评估会话 {session_num}: 已输入用户名和密码")
-
-            # 点击登录按钮
-            login_btn = driver.find_element(By.ID, "J-login-btn")
-            login_btn.click()
-            print(f"评估会话 {session_num}: 已点击登录按钮")
-
-            # 等待登录完成
-            time.sleep(3)
-            return True
+        self.log(session_num, "正在登录...")
+        return self.submit_login_form(driver, session_num)
+
+    def submit_login_form(self, driver, session_num=None):
+        """打开登录页，填写学号和密码并提交，返回True；session_num为None时是主会话
+
+        等待超时等可重试的异常直接抛出，交给login阶段的重试策略；提交后仍显示登录表单时抛出LoginRejected，不再重试。
+        """
+        if self.password_rejected:
+            raise LoginRejected("学号或密码已被登录页拒绝，不再提交登录表单")
+        driver.get(self.login_url)
+        # 等待用户名输入框
+        username_input = self.waits.element_present(driver, (By.ID, "username"), 'login')
+        password_input = driver.find_element(By.ID, "passwordOld")
+
+        # 输入用户名和密码
+        username_input.clear()
+        username_input.send_keys(self.student_id)
+        password_input.clear()
+        password_input.send_keys(self.password)
+        self.log(session_num, "已输入用户名和密码")
+
+        # 点击登录按钮
+        login_url = driver.current_url
+        login_btn = driver.find_element(By.ID, "J-login-btn")
+        login_btn.click()
+        with self.lock:
+            self.login_count += 1
+        self.log(session_num, "已点击登录按钮")
+
+        # 等待登录完成后的页面跳转；没有跳转或跳转后仍是登录页说明学号或密码被拒绝
+        try:
+            self.waits.url_changed(driver, login_url, 'login')
+            self.waits.settle(driver, 'login')
+        except TimeoutException:
+            if not self.is_login_page(driver):
+                raise
+        if self.is_login_page(driver):
+            prefix = f"评估会话 {session_num}: " if session_num is not None else ""
+            self.reject_login(f"{prefix}登录失败，提交后仍显示登录表单，请检查学号和密码")
+        return True
+
+    def log(self, session_num, message):
+        """输出会话的过程信息；开启进度视图时交给进度视图显示，避免与汇总表格交错，错误仍直接打印"""
+        if session_num is None:
+            print(message)
+        elif self.progress:
+            self.progress.note(session_num, message)
+        else:
+            print_session_message(session_num, message)
+
+    def reject_login(self, message):
+        """记录登录页拒绝了学号或密码并抛出LoginRejected，之后所有会话都不再提交登录表单"""
+        self.password_rejected = True
+        print(message)
+        raise LoginRejected("学号或密码错误")
+
+    def login_main_session(self, login):
+        """按login阶段的策略登录主会话，成功返回True；密码被拒绝或用完重试次数时返回False"""
+        try:
+            return self.retry.run('login', '主会话', login)
+        except EvaluationCancelled:
+            raise
         except Exception as e:
-            print(f"评估会话 {session_num} 登录过程中出错: {e}")
+            print(f"主会话登录失败: {e}")
             return False
 
     def navigate_to_evaluation_main(self):
@@ -95,23 +2512,23 @@ class TeachingEvaluationBot:
         try:
             # 点击刷新按钮
             refresh_button_xpath = "//*[@id='page-content-template']/div[1]/div[2]/div/div[1]/div/a"
-            refresh_button = self.wait.until(
-                EC.element_to_be_clickable((By.XPATH, refresh_button_xpath))
-            )
+            refresh_button = self.waits.element_clickable(self.main_driver, (By.XPATH, refresh_button_xpath), 'navigate')
             refresh_button.click()
             print("已点击刷新按钮")
-            time.sleep(3)
+            self.waits.settle(self.main_driver, 'navigate')
 
             # 点击教学评估菜单
-            evaluation_menu = self.wait.until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, "//li[contains(@class, 'click-item') and contains(text(), '教学评估')]"))
-            )
+            evaluation_menu = self.waits.element_clickable(
+                self.main_driver,
+                (By.XPATH, "//li[contains(@class, 'click-item') and contains(text(), '教学评估')]"),
+                'navigate')
+            menu_url = self.main_driver.current_url
             evaluation_menu.click()
             print("已点击教学评估菜单")
 
             # 等待页面跳转和刷新完成
-            time.sleep(3)
+            self.waits.url_changed(self.main_driver, menu_url, 'navigate')
+            self.waits.settle(self.main_driver, 'navigate')
             return True
         except Exception as e:
             print(f"导航到评估页面时出错: {e}")
@@ -121,406 +2538,915 @@ class TeachingEvaluationBot:
         """评估会话导航到教学评估页面"""
         try:
             # 点击教学评估菜单
-            wait = WebDriverWait(driver, 10)
-            evaluation_menu = wait.until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, "//li[contains(@class, 'click-item') and contains(text(), '教学评估')]"))
-            )
+            evaluation_menu = self.waits.element_clickable(
+                driver,
+                (By.XPATH, "//li[contains(@class, 'click-item') and contains(text(), '教学评估')]"),
+                'navigate')
+            menu_url = driver.current_url
             evaluation_menu.click()
-            print(f"评估会话 {session_num}: 已点击教学评估菜单")
+            self.log(session_num, "已点击教学评估菜单")
 
             # 等待页面跳转
-            time.sleep(3)
+            self.waits.url_changed(driver, menu_url, 'navigate')
+            self.waits.settle(driver, 'navigate')
             return True
         except Exception as e:
             print(f"评估会话 {session_num} 导航到评估页面时出错: {e}")
             return False
 
-    def parse_course_table(self):
-        """解析课程表格并创建课程字典"""
+    def export_shared_cookies(self):
+        """导出主会话已认证的Cookie（JSESSIONID等），供评估会话注入"""
         try:
-            # 等待表格加载
-            table = self.wait.until(
-                EC.presence_of_element_located((By.XPATH, "//*[@id='page_div']/table"))
-            )
-
-            # 获取所有课程行
-            course_rows = self.main_driver.find_elements(By.XPATH, "//tbody[@id='jxpgtbody']/tr")
-            print(f"\n找到 {len(course_rows)} 门需要评估的课程:")
-            print("-" * 80)
-            print(f"{'序号':<4} {'课程名称':<20} {'教师':<10} {'评估内容':<20} {'状态':<8}")
-            print("-" * 80)
-
-            # 解析每门课程信息
-            for i, row in enumerate(course_rows, 1):
-                try:
-                    # 获取课程信息
-                    course_name = row.find_element(By.XPATH, "./td[4]").text  # 评估内容列
-                    teacher_name = row.find_element(By.XPATH, "./td[3]").text  # 被评人列
-                    status = row.find_element(By.XPATH, "./td[5]").text.strip()  # 是否已评估列
-
-                    # 获取评估按钮
-                    eval_button = row.find_element(By.XPATH, "./td[1]/button")
-
-                    # 添加到课程字典
-                    course_key = f"{course_name}_{teacher_name}"
-                    self.course_dict[course_key] = {
-                        'index': i,
-                        'course_name': course_name,
-                        'teacher': teacher_name,
-                        'status': status,
-                        'button': eval_button,
-                        'evaluated': False,
-                        'evaluation_completed': False,  # 标记评估是否已完成
-                        'submitted': False  # 标记是否已提交
-                    }
-
-                    print(f"{i:<4} {course_name:<20} {teacher_name:<10} {course_name:<20} {status:<8}")
-                except Exception as e:
-                    print(f"解析第 {i} 门课程时出错: {e}")
-                    continue
+            self.shared_cookies = self.main_driver.get_cookies()
+            names = ", ".join(cookie['name'] for cookie in self.shared_cookies)
+            print(f"已导出主会话Cookie: {names}")
+        except Exception as e:
+            self.shared_cookies = []
+            print(f"导出主会话Cookie时出错: {e}")
+
+    def inject_shared_cookies(self, driver):
+        """在评估会话访问页面前注入主会话的Cookie"""
+        cdp_cookies = []
+        for cookie in self.shared_cookies:
+            cdp_cookie = {
+                'name': cookie['name'],
+                'value': cookie['value'],
+                'path': cookie.get('path', '/'),
+                'secure': cookie.get('secure', False),
+                'httpOnly': cookie.get('httpOnly', False),
+            }
+            if cookie.get('domain'):
+                cdp_cookie['domain'] = cookie['domain']
+            else:
+                cdp_cookie['url'] = self.login_url
+            if 'expiry' in cookie:
+                cdp_cookie['expires'] = cookie['expiry']
+            if cookie.get('sameSite') in ('Strict', 'Lax', 'None'):
+                cdp_cookie['sameSite'] = cookie['sameSite']
+            cdp_cookies.append(cdp_cookie)
 
-            print("-" * 80)
+        try:
+            # 通过CDP在首次导航前写入Cookie
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': cdp_cookies})
+        except Exception:
+            # 不支持CDP时先打开同域页面再逐个添加
+            driver.get(self.login_url)
+            for cookie in self.shared_cookies:
+                driver.add_cookie({key: value for key, value in cookie.items() if key != 'sameSite'})
+
+    def is_login_page(self, driver):
+        """判断当前页面是否为登录页（会话未认证或已失效）"""
+        return bool(driver.find_elements(By.ID, "J-login-btn"))
+
+    def login_with_shared_session(self, driver, session_num):
+        """使用主会话Cookie进入评估列表页，被拒绝时返回False"""
+        try:
+            self.inject_shared_cookies(driver)
+            driver.get(self.evaluation_index_url)
+            if self.is_login_page(driver):
+                self.log(session_num, "共享会话被拒绝，回退到账号密码登录")
+                with self.lock:
+                    self.shared_session_fallbacks += 1
+                return False
+            with self.lock:
+                self.shared_session_hits += 1
+            self.log(session_num, "已通过共享会话登录")
             return True
         except Exception as e:
-            print(f"解析课程表格时出错: {e}")
+            print(f"评估会话 {session_num} 注入共享会话时出错: {e}")
+            with self.lock:
+                self.shared_session_fallbacks += 1
             return False
 
-    def evaluate_single_course(self, course_info, session_num):
-        """单个课程的完整评估流程"""
-        driver = None
+    def create_evaluation_driver(self, session_num):
+        """创建新的评估浏览器并完成登录和导航，供驱动池调用；失败时按login阶段的策略重试"""
+        with self.profiler.phase('login', session_num):
+            driver = self.retry.run('login', session_num, lambda: self.try_create_evaluation_driver(session_num),
+                                    stop=self.evaluation_login_aborted)
+        if not driver:
+            raise RuntimeError("新建评估浏览器登录或导航失败")
+        return driver
+
+    def try_create_evaluation_driver(self, session_num):
+        """启动一个浏览器并登录，返回driver；失败时关闭浏览器并抛出异常，由login阶段的retry_on决定是否重试"""
+        driver = self.new_browser(str(session_num))
+        # 与主会话登录同时预热的浏览器先启动Chrome，等主会话导出Cookie后再登录
+        self.main_session_ready.wait()
+        if self.evaluation_login_aborted():
+            self.quit_driver(driver)
+            raise EvaluationCancelled("主会话登录失败、密码被拒绝或驱动池已关闭，不再登录评估浏览器")
         try:
-            print(f"\n评估会话 {session_num}: 开始处理课程 {course_info['course_name']}")
-
-            # 创建新的driver
-            driver = webdriver.Chrome(options=self.chrome_options)
-
-            # 在新会话中登录
-            if not self.login_evaluation_session(driver, session_num):
-                print(f"评估会话 {session_num}: 登录失败")
-                return
-
-            # 导航到评估页面
+            if (self.config['share_session'] and self.shared_cookies and
+                    self.login_with_shared_session(driver, session_num)):
+                return driver
+            self.login_evaluation_session(driver, session_num)
             if not self.navigate_to_evaluation_session(driver, session_num):
-                print(f"评估会话 {session_num}: 导航到评估页面失败")
-                return
-
-            # 直接访问评估页面URL
-            driver.get("http://jwcxk2.aufe.edu.cn/student/teachingEvaluation/evaluation/index")
-            time.sleep(3)
-
-            # 点击对应的评估按钮
-            course_rows = driver.find_elements(By.XPATH, "//tbody[@id='jxpgtbody']/tr")
-            button_clicked = False
-
-            for row in course_rows:
-                try:
-                    row_course_name = row.find_element(By.XPATH, "./td[4]").text
-                    row_teacher_name = row.find_element(By.XPATH, "./td[3]").text
-                    if (row_course_name == course_info['course_name'] and
-                            row_teacher_name == course_info['teacher']):
-                        eval_button = row.find_element(By.XPATH, "./td[1]/button")
-                        eval_button.click()
-                        print(f"评估会话 {session_num}: 已点击课程 {course_info['course_name']} 的评估按钮")
-                        time.sleep(3)
-                        button_clicked = True
-                        break
-                except Exception:
-                    continue
-
-            if not button_clicked:
-                print(f"评估会话 {session_num}: 未找到课程 {course_info['course_name']} 的评估按钮")
-                return
-
-            # 填写评估表单
-            print(f"评估会话 {session_num}: 开始填写课程 {course_info['course_name']} 的评估表单...")
-
-            # 选择满意度选项
-            if not self.select_satisfaction(driver, session_num):
-                print(f"评估会话 {session_num}: 选择满意度选项失败")
-                return
-
-            # 填写评价文本
-            if not self.fill_evaluation_text(driver, session_num):
-                print(f"评估会话 {session_num}: 填写评价文本失败")
-                return
-
-            print(f"评估会话 {session_num}: ✓ 已完成课程 {course_info['course_name']} 的表单填写")
+                raise StageError("导航到评估页面失败")
+            return driver
+        except Exception:
+            self.quit_driver(driver)
+            raise
+
+    def evaluation_login_aborted(self):
+        """主会话登录失败、密码被拒绝或驱动池已关闭后，评估浏览器不必再登录"""
+        return self.main_session_failed or self.password_rejected or self.driver_pool.closed
+
+    @staticmethod
+    def quit_driver(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
 
-            # 标记评估完成
-            with self.lock:
-                course_info['evaluation_completed'] = True
-                self.completed_evaluations += 1
+    def reset_to_evaluation_index(self, driver, session_num):
+        """将借出的driver重置到评估列表页，会话失效时重新登录"""
+        driver.get(self.evaluation_index_url)
+        self.waits.settle(driver, 'navigate')
+        if self.is_login_page(driver):
+            self.log(session_num, "登录状态已失效，重新登录")
+            if not (self.login_evaluation_session(driver, session_num) and
+                    self.navigate_to_evaluation_session(driver, session_num)):
+                return False
+            driver.get(self.evaluation_index_url)
+            self.waits.settle(driver, 'navigate')
+        return True
 
-            # 记录填写完成时间
-            completion_time = time.time()
-            print(
-                f"评估会话 {session_num}: 表单填写完成时间: {time.strftime('%H:%M:%S', time.localtime(completion_time))}")
+    def parse_course_table(self):
+        """解析课程表格并创建课程字典"""
+        try:
+            self.load_course_rows(self.read_course_rows())
+            self.resolve_course_targets(self.course_dict.values())
+            return True
+        except Exception as e:
+            print(f"解析课程表格时出错: {e}")
+            return False
 
-            # 独立等待120秒
-            print(f"评估会话 {session_num}: 开始独立等待120秒...")
-            self.wait_with_progress_independent(session_num, 120)
+    def read_course_rows(self):
+        """等待主浏览器中的评估列表加载完成，一次脚本调用读取整张表格"""
+        self.waits.element_present(self.main_driver, (By.XPATH, "//*[@id='page_div']/table"), 'navigate')
+        self.waits.ajax_idle(self.main_driver, 'navigate')
+        return self.main_driver.execute_script(COURSE_TABLE_SCRIPT)
 
-            # 提交评估
-            print(f"评估会话 {session_num}: 正在提交课程 {course_info['course_name']} 的评估...")
-            if self.submit_evaluation(driver, session_num):
-                with self.lock:
-                    course_info['evaluated'] = True
-                    course_info['submitted'] = True
-                print(f"评估会话 {session_num}: ✓ 已成功提交课程 {course_info['course_name']} 的评估")
-            else:
-                print(f"评估会话 {session_num}: ✗ 提交课程 {course_info['course_name']} 的评估失败")
+    def resolve_course_targets(self, courses):
+        """把评估按钮映射为问卷地址，评估会话直接打开问卷"""
+        if self.http_engine:
+            self.http_engine.resolve_targets(courses)
+            return
+        if not self.config['deep_link']:
+            return
+        evaluation_form = parse_page(self.main_driver.page_source).evaluation_form()
+        page_url = self.main_driver.current_url
+        for course_info in courses:
+            course_info['target'] = resolve_evaluation_target(page_url, evaluation_form, course_info['onclick'])
+
+    def reload_course_rows(self):
+        """重新加载一次评估列表并读取所有课程行，主会话登录状态失效时重新登录；失败返回None"""
+        if self.http_engine:
+            rows = self.http_engine.fetch_course_rows()
+            if rows is None and self.login_main_session(self.http_engine.login):
+                rows = self.http_engine.fetch_course_rows()
+            return rows
+        self.main_driver.get(self.evaluation_index_url)
+        self.waits.settle(self.main_driver, 'navigate')
+        if self.is_login_page(self.main_driver):
+            print("主会话登录状态已失效，重新登录")
+            if not (self.login_main_session(self.login_main) and self.navigate_to_evaluation_main()):
+                return None
+        return self.read_course_rows()
+
+    def verify_results(self):
+        """重新加载评估列表，用服务器显示的"是否已评估"核对本次运行的结果
+
+        列表显示"是"的课程记为服务器确认，其他无法识别的状态保持未确认；提交时认为成功、列表却仍显示"否"的课程重置为未评估，
+        返回这些课程以便重新评估。评估列表加载失败时返回空列表，所有结果都保持未确认。
+        """
+        print("\n正在重新加载评估列表，核对评估结果...")
+        try:
+            with self.profiler.phase('navigate', '主会话'):
+                rows = self.reload_course_rows()
+        except Exception as e:
+            print(f"核对评估结果时出错: {e}")
+            rows = None
+        if rows is None:
+            print("无法重新加载评估列表，评估结果未经服务器确认")
+            return []
+
+        mismatched = []
+        for course_info, row in self.refresh_course_rows(rows):
+            course_info['status'] = row['status']
+            course_info['verified'] = True
+            # 只有列表明确显示"是"才算服务器确认，空白或其他取值保持未确认
+            if row['status'] == '是':
+                course_info['confirmed'] = True
+                if course_info['submitted']:
+                    self.checkpoint.record(self.student_id, course_info, 'confirmed')
+                course_info['evaluated'] = True
+            elif row['status'] != '否':
+                print(f"核对: 课程 {course_info['course_name']} - {course_info['teacher']} "
+                      f"的评估状态无法识别（{row['status'] or '空'}），结果未确认")
+            elif course_info['evaluated']:
+                print(f"核对: 课程 {course_info['course_name']} - {course_info['teacher']} 已提交，但评估列表仍显示未评估")
+                course_info.update(evaluated=False, submitted=False, evaluation_completed=False)
+                self.checkpoint.record(self.student_id, course_info, 'unconfirmed')
+                if self.check_attempts(course_info):
+                    mismatched.append(course_info)
+        # 重新评估的课程使用新加载的评估列表中的问卷地址
+        if mismatched:
+            self.resolve_course_targets(mismatched)
+        confirmed = sum(1 for course_info in self.course_dict.values() if course_info.get('confirmed'))
+        print(f"核对完成: 服务器确认已评估 {confirmed}/{len(self.course_dict)} 门课程，"
+              f"{len(mismatched)} 门提交未生效")
+        return mismatched
+
+    def load_course_rows(self, rows):
+        """根据表格行数据创建课程字典和(课程, 教师)索引"""
+        print(f"\n找到 {len(rows)} 门需要评估的课程:")
+        print("-" * 80)
+        print(f"{'序号':<4} {'课程名称':<20} {'教师':<10} {'评估内容':<20} {'状态':<8}")
+        print("-" * 80)
+
+        for i, row in enumerate(rows, 1):
+            course_name = row['course_name']  # 评估内容列
+            teacher_name = row['teacher']  # 被评人列
+            status = row['status']  # 是否已评估列
+
+            # 添加到课程字典
+            course_key = f"{course_name}_{teacher_name}"
+            self.course_dict[course_key] = {
+                'index': i,
+                'course_name': course_name,
+                'teacher': teacher_name,
+                'status': status,
+                'row': row['row'],  # 评估列表中的行号
+                'button_id': row['button_id'],
+                'onclick': row['onclick'],
+                'evaluated': False,
+                'evaluation_completed': False,  # 标记评估是否已完成
+                'submitted': False,  # 标记是否已提交
+                'confirmed': False,  # 运行结束后核对时评估列表显示已评估
+                'abandoned': False,  # 填写次数用完，不再评估
+            }
+            self.course_index[(course_name, teacher_name)] = self.course_dict[course_key]
+
+            print(f"{i:<4} {course_name:<20} {teacher_name:<10} {course_name:<20} {status:<8}")
+
+        print("-" * 80)
+
+    def find_course(self, course_name, teacher):
+        """按(课程, 教师)查找课程信息"""
+        return self.course_index.get((course_name, teacher))
+
+    def refresh_course_rows(self, rows):
+        """用重新读取的表格行更新课程的行号和评估按钮，返回[(课程信息, 表格行), ...]，不在课程字典中的行忽略"""
+        matched = []
+        with self.lock:
+            for row in rows:
+                course_info = self.find_course(row['course_name'], row['teacher'])
+                if course_info is None:
+                    continue
+                course_info.update(row=row['row'], button_id=row['button_id'], onclick=row['onclick'])
+                matched.append((course_info, row))
+        return matched
+
+    def start_course_session(self, course_info, session_num):
+        """借出浏览器，打开并填写课程表单；成功返回driver（等待提交期间保持借出），失败返回None
+
+        失败时按open阶段的策略重试，浏览器出错或策略要求时换用驱动池中的另一个浏览器。
+        """
+        session = {'driver': None, 'healthy': True}
+
+        def attempt():
+            # 从驱动池借出已登录的driver
+            if session['driver'] is None:
+                # 冷启动和登录不是打开表单的服务器延迟
+                with SERVER_LATENCY.paused():
+                    session['driver'] = self.driver_pool.acquire(session_num)
+                session['healthy'] = True
+                if self.memory_governor:
+                    self.memory_governor.assign(session['driver'], session_num)
+            driver = session['driver']
+            try:
+                # 能直接打开问卷时不必重置到评估列表页
+                if self.can_deep_link(driver, course_info):
+                    return self.open_and_fill_course_form(driver, course_info, session_num)
+                # 重置到评估列表页
+                with self.profiler.phase('navigate', session_num):
+                    reset_ok = self.reset_to_evaluation_index(driver, session_num)
+                if not reset_ok:
+                    raise StageError("重置到评估页面失败")
+                # 打开并填写评估表单
+                return self.open_and_fill_course_form(driver, course_info, session_num)
+            except Exception:
+                session['healthy'] = False
+                raise
+
+        def release():
+            if session['driver']:
+                if self.memory_governor:
+                    self.memory_governor.unassign(session['driver'])
+                self.driver_pool.release(session['driver'], healthy=session['healthy'])
+                session['driver'] = None
+                self.log(session_num, "已归还浏览器")
+
+        def on_retry():
+            if not session['healthy'] or self.retry.policy('open')['recreate_driver']:
+                release()
+
+        self.log(session_num, f"开始处理课程 {course_info['course_name']}")
+        try:
+            if self.retry.run('open', session_num, attempt, on_retry):
+                return session['driver']
+        except Exception as e:
+            print(f"评估会话 {session_num} 处理课程 {course_info['course_name']} 时出错: {e}")
+            session['healthy'] = False
+        release()
+        return None
 
+    def finish_course_session(self, course_info, session_num, driver):
+        """等待时间到达后提交表单并归还浏览器"""
+        driver_healthy = True
+        try:
+            self.submit_course_form(driver, course_info, session_num)
         except Exception as e:
             print(f"评估会话 {session_num} 处理课程 {course_info['course_name']} 时出错: {e}")
+            driver_healthy = False
         finally:
-            # 关闭driver
-            if driver:
-                try:
-                    driver.quit()
-                    print(f"评估会话 {session_num}: 已关闭浏览器")
-                except:
-                    pass
+            # 归还driver到驱动池
+            if self.memory_governor:
+                self.memory_governor.unassign(driver)
+            self.driver_pool.release(driver, healthy=driver_healthy)
+            self.log(session_num, "已归还浏览器")
+
+    def open_and_fill_course_form(self, driver, course_info, session_num):
+        """在评估列表页中点开课程表单并填写，分别计入locate和fill阶段"""
+        with self.profiler.phase('locate', session_num):
+            if not self.open_course_form(driver, course_info, session_num):
+                return False
+        with self.profiler.phase('fill', session_num):
+            return self.fill_course_form(driver, course_info, session_num)
+
+    def can_deep_link(self, driver, course_info):
+        """课程有问卷地址且浏览器停留在教务系统页面上时，可以直接打开问卷"""
+        return bool(self.deep_link_enabled and course_info.get('target') and
+                    driver.current_url.startswith(self.base_url))
+
+    def open_course_by_link(self, driver, course_info, session_num):
+        """直接提交问卷请求打开评估表单，登录失效时重新登录一次；问卷没有出现时返回False"""
+        target = course_info['target']
+        for attempt in range(2):
+            old_page = driver.find_element(By.TAG_NAME, 'html')
+            driver.execute_script(OPEN_TARGET_SCRIPT, target['url'], target['method'], target['params'])
+            self.waits.page_replaced(driver, old_page, 'course_form')
+            self.waits.settle(driver, 'course_form')
+            if not self.is_login_page(driver):
+                break
+            self.log(session_num, "登录状态已失效，重新登录")
+            if attempt or not (self.login_evaluation_session(driver, session_num) and
+                               self.navigate_to_evaluation_session(driver, session_num)):
+                return False
+        if not self.deep_linked_form_ready(driver, course_info, session_num):
+            return False
+        self.log(session_num, f"已直接打开课程 {course_info['course_name']} 的问卷")
+        return True
+
+    def open_course_form(self, driver, course_info, session_num):
+        """打开课程的评估表单：优先直接打开问卷，失败时回到评估列表页找到课程所在行并点击评估按钮"""
+        if self.can_deep_link(driver, course_info):
+            try:
+                opened = self.open_course_by_link(driver, course_info, session_num)
+            except TimeoutException:
+                opened = False
+            with self.lock:
+                if opened:
+                    self.deep_link_hits += 1
+                else:
+                    self.deep_link_fallbacks += 1
+            if opened:
+                return True
+            self.log(session_num, "直接打开问卷失败，回到评估列表页")
+            if not self.reset_to_evaluation_index(driver, session_num):
+                raise StageError("重置到评估页面失败")
 
-    def wait_with_progress_independent(self, session_num, wait_time):
-        """独立会话的带进度显示的等待"""
-        start_time = time.time()
-        while time.time() - start_time < wait_time:
-            elapsed = time.time() - start_time
-            remaining = wait_time - elapsed
-            if remaining % 30 == 0 or remaining <= 10:
-                print(f"评估会话 {session_num}: 剩余等待时间: {int(remaining)} 秒")
-            time.sleep(1)
-        print(f"评估会话 {session_num}: 等待完成，准备提交")
+        try:
+            self.waits.element_present(driver, (By.XPATH, "//tbody[@id='jxpgtbody']/tr"), 'navigate')
+        except TimeoutException:
+            pass
+        course_name, teacher = course_info['course_name'], course_info['teacher']
+
+        # 按主会话解析时的行号直接校验并点击
+        clicked = driver.execute_script(CLICK_COURSE_BUTTON_SCRIPT, course_info['row'], course_name, teacher)
+        if not clicked:
+            # 行顺序发生变化时重新读取整张表格，通过课程索引更新所有课程的行号后再定位
+            matched = self.refresh_course_rows(driver.execute_script(COURSE_TABLE_SCRIPT))
+            if any(matched_course is course_info for matched_course, _ in matched):
+                clicked = driver.execute_script(CLICK_COURSE_BUTTON_SCRIPT, course_info['row'], course_name, teacher)
+
+        if not clicked:
+            raise StageError(f"未找到课程 {course_name} 的评估按钮")
+        self.log(session_num, f"已点击课程 {course_name} 的评估按钮")
+        return True
+
+    def fill_course_form(self, driver, course_info, session_num):
+        """填写评估表单并标记评估完成"""
+        self.log(session_num, f"开始填写课程 {course_info['course_name']} 的评估表单...")
+
+        # 一次性选择满意度选项并填写评价文本，失败时抛出异常
+        self.fill_questionnaire(driver, session_num)
+
+        self.log(session_num, f"✓ 已完成课程 {course_info['course_name']} 的表单填写")
+
+        # 标记评估完成并记录填写完成时间
+        completion_time = time.time()
+        with self.lock:
+            course_info['evaluation_completed'] = True
+            course_info['filled_at'] = completion_time
+            self.completed_evaluations += 1
+        self.checkpoint.record(self.student_id, course_info, 'filled')
+
+        print(
+            f"评估会话 {session_num}: 表单填写完成时间: {time.strftime('%H:%M:%S', time.localtime(completion_time))}")
+        return True
+
+    def submit_course_form(self, driver, course_info, session_num):
+        """提交已填写的评估表单并标记提交结果"""
+        self.profiler.record_phase('wait', session_num, time.time() - course_info['filled_at'])
+        self.log(session_num, f"正在提交课程 {course_info['course_name']} 的评估...")
+        with self.profiler.phase('submit', session_num):
+            # 提交失败时只重试提交，不重新填写和等待；已经点击过确认按钮后不再重试
+            progress = {'sent': False}
+            submitted = self.retry.run('submit', session_num,
+                                       lambda: self.submit_evaluation(driver, session_num, progress))
+        if submitted:
+            with self.lock:
+                course_info['evaluated'] = True
+                course_info['submitted'] = True
+            self.checkpoint.record(self.student_id, course_info, 'submitted')
+            self.log(session_num, f"✓ 已成功提交课程 {course_info['course_name']} 的评估")
+            return True
+        print(f"评估会话 {session_num}: ✗ 提交课程 {course_info['course_name']} 的评估失败")
+        return False
+
+    def courses_to_evaluate(self):
+        """返回尚未评估的课程列表"""
+        return [course for course in self.course_dict.values()
+                if course['status'] == '否' and not course['evaluated'] and not course['abandoned']]
 
     def evaluate_all_courses_independent_timing(self):
         """独立计时的并行评估"""
         print("\n开始独立计时的并行评估...")
 
         # 获取需要评估的课程列表
-        courses_to_evaluate = [course for course in self.course_dict.values()
-                               if course['status'] == '否' and not course['evaluated']]
+        courses_to_evaluate = self.courses_to_evaluate()
         print(f"需要评估的课程数量: {len(courses_to_evaluate)}")
 
         if not courses_to_evaluate:
             print("没有需要评估的课程")
-            return
-
-        # 使用线程池并行处理所有课程
-        futures = []
-        for i, course_info in enumerate(courses_to_evaluate):
-            # 每6秒创建一个新的线程
-            if i > 0:
-                time.sleep(6)
-                print(f"等待6秒后创建下一个评估会话... ({i + 1}/{len(courses_to_evaluate)})")
 
-            # 提交任务到线程池
-            future = self.thread_pool.submit(self.evaluate_single_course, course_info, i + 1)
-            futures.append(future)
-            print(f"已创建评估会话 {i + 1} 用于课程 {course_info['course_name']}")
-
-        # 等待所有任务完成
-        print("\n所有评估会话已创建，等待所有评估完成...")
-        for future in futures:
-            future.result()
+        rounds = self.config['verify_requeue_rounds']
+        for round_number in range(rounds + 1):
+            # 由调度器按启动间隔打开并填写表单，等待期间不占用线程，到期后提交
+            if courses_to_evaluate:
+                open_form, submit_form, executor, max_in_flight = self.plan_evaluation(courses_to_evaluate)
+                try:
+                    self.run_scheduled(courses_to_evaluate, open_form, submit_form,
+                                       executor or self.thread_pool, max_in_flight)
+                finally:
+                    if executor:
+                        shutdown_executor(executor, self.cancel_event.is_set())
+
+            # 重新加载一次评估列表核对结果（没有需要评估的课程时也核对），本地记为已评估、列表却仍显示未评估的课程重新评估
+            if not self.config['verify_after_run'] or self.cancel_event.is_set():
+                break
+            courses_to_evaluate = self.verify_results()
+            if not courses_to_evaluate:
+                break
+            if round_number == rounds:
+                print(f"{len(courses_to_evaluate)} 门课程提交未生效，已达到重新评估次数上限")
+                break
+            print(f"\n重新评估 {len(courses_to_evaluate)} 门提交未生效的课程（第 {round_number + 1} 轮）")
 
         # 打印评估总结
         self.print_evaluation_summary()
 
-    def select_satisfaction(self, driver, session_num):
-        """选择满意度选项"""
+    def plan_evaluation(self, courses_to_evaluate, warm_up=True):
+        """按执行引擎返回(打开表单, 提交表单, 专用线程池, 同时进行的课程数)
+
+        专用线程池为None时使用调度器的线程池；不为None时由调用方在结束后关闭。
+        """
+        # 无浏览器HTTP模式
+        if self.http_engine:
+            return self.http_engine.plan_evaluation(courses_to_evaluate)
+
+        # 单浏览器多标签页模式
+        if self.config['engine'] == 'tab':
+            return self.plan_tab_evaluation()
+
+        # 按待评估课程数调整预热数量：课程较少时关闭多余的预热浏览器，较多时在后台补足，评估不必等待预热全部完成
+        if warm_up:
+            needed = min(len(courses_to_evaluate), self.config['pool_size'])
+            self.driver_pool.shrink(needed)
+            self.driver_pool.warm_up(self.warm_up_limit(needed), wait=False)
+
+        # 由驱动池借出浏览器填写表单，提交后归还
+        print(f"\n使用多浏览器模式，最多同时使用 {self.config['pool_size']} 个浏览器")
+        return self.start_course_session, self.finish_course_session, None, self.config['pool_size']
+
+    def run_scheduled(self, courses_to_evaluate, open_form, submit_form, executor, max_in_flight):
+        """用事件驱动调度器处理所有课程，启动间隔和同时进行的课程数由启动策略决定"""
+        policy = make_launch_policy(self.config, max_in_flight)
+        self.launch_policy = policy
+        self.waits.on_timeout = policy.record_timeout
+        scheduler = EvaluationScheduler(executor, policy, self.config['fill_wait_seconds'],
+                                        cancel_event=self.cancel_event)
+        if self.memory_governor:
+            scheduler.admission = self.memory_governor.admit
+        scheduler.progress = make_progress_reporter(self.config)
+        if scheduler.progress:
+            self.profiler.on_phase = scheduler.progress.publish
+            self.progress = scheduler.progress
+            scheduler.progress.start()
         try:
-            # 等待页面完全加载
-            time.sleep(3)
-
-            # 查找所有单选按钮组
-            radio_inputs = driver.find_elements(By.XPATH, "//input[@type='radio']")
-
-            # 按name属性分组
-            radio_groups = {}
-            for radio in radio_inputs:
-                name = radio.get_attribute('name')
-                if name not in radio_groups:
-                    radio_groups[name] = []
-                radio_groups[name].append(radio)
-
-            print(f"评估会话 {session_num}: 找到 {len(radio_groups)} 个问题组")
-
-            # 对每个组选择最满意的选项
-            for name, radios in radio_groups.items():
-                best_option = None
-                best_option_radio = None
-
-                for radio in radios:
-                    try:
-                        # 查找标签
-                        label = radio.find_element(By.XPATH,
-                                                   "./following-sibling::span[contains(@class, 'lbl')]/following-sibling::span")
-                        label_text = label.text
-
-                        # 如果是"非常满意"，直接选择
-                        if "非常满意" in label_text:
-                            best_option = "非常满意"
-                            best_option_radio = radio
-                            break
-                        # 如果是"满意"且还没有找到更好的选项
-                        elif "满意" in label_text and "非常" not in label_text and best_option != "非常满意":
-                            best_option = "满意"
-                            best_option_radio = radio
-                    except:
-                        continue
-
-                # 选择最佳选项
-                if best_option_radio:
-                    driver.execute_script("arguments[0].click();", best_option_radio)
-                    # print(f"评估会话 {session_num}: 组 {name}: 已选择 {best_option}")
-                else:
-                    # 如果没有找到满意的选项，选择第一个
-                    driver.execute_script("arguments[0].click();", radios[0])
-                    # print(f"评估会话 {session_num}: 组 {name}: 已选择第一个选项")
-
-            # 添加验证步骤
-            # self.verify_selections(driver, session_num)
-            # print(f"评估会话 {session_num}: 所有满意度选项已选择")
+            scheduler.run(courses_to_evaluate, open_form, submit_form)
+        finally:
+            if scheduler.progress:
+                self.profiler.on_phase = None
+                self.progress = None
+                scheduler.progress.stop()
+
+    def warm_up_limit(self, count):
+        """预热数量不超过内存余量允许的浏览器数，其余在评估时按需启动"""
+        if not self.memory_governor:
+            return count
+        capacity = self.memory_governor.capacity()
+        if capacity is None:
+            return count
+        limit = max(self.driver_pool.size() + capacity, 1)
+        if limit < count:
+            print(f"可用内存只够再启动 {capacity} 个浏览器，预热数量由 {count} 减为 {limit}")
+        return min(count, limit)
+
+    def plan_tab_evaluation(self):
+        """单浏览器多标签页评估：在主浏览器中为每门课程打开一个标签页，轮转填写、等待和提交"""
+        driver = self.main_driver
+        main_handle = driver.current_window_handle
+        max_tabs = self.config['max_tabs']
+
+        def open_form(course_info, session_num):
+            # 每次重试都新开一个标签页
+            return self.retry.run(
+                'open', session_num, lambda: self.open_course_tab(driver, course_info, session_num, main_handle))
+
+        def submit_form(course_info, session_num, handle):
+            try:
+                driver.switch_to.window(handle)
+                self.submit_course_form(driver, course_info, session_num)
+            finally:
+                self.close_tab(driver, handle, main_handle)
+
+        # 所有标签页共用一个driver，任务必须在专用的单线程线程池中串行执行
+        print(f"\n使用单浏览器多标签页模式，最多同时打开 {max_tabs} 个标签页")
+        return open_form, submit_form, ThreadPoolExecutor(max_workers=1), max_tabs
+
+    def open_course_tab(self, driver, course_info, session_num, main_handle):
+        """新建标签页打开课程评估表单并填写，返回标签页句柄；失败时关闭标签页并抛出异常，由open阶段的retry_on决定是否重试"""
+        self.log(session_num, f"在新标签页中处理课程 {course_info['course_name']}")
+        handle = None
+        try:
+            if self.can_deep_link(driver, course_info):
+                # 从主标签页提交问卷请求，问卷直接在新标签页中打开
+                with self.profiler.phase('locate', session_num):
+                    handle = self.open_target_in_new_tab(driver, course_info['target'])
+                    form_ready = self.deep_linked_form_ready(driver, course_info, session_num)
+                if form_ready:
+                    with self.lock:
+                        self.deep_link_hits += 1
+                    with self.profiler.phase('fill', session_num):
+                        if self.fill_course_form(driver, course_info, session_num):
+                            return handle
+                    raise StageError("填写评估表单失败")
+                # 问卷没有出现或不属于这门课程，已停止直接打开，在该标签页中回到评估列表点击
+                with self.lock:
+                    self.deep_link_fallbacks += 1
+                with self.profiler.phase('navigate', session_num):
+                    if not self.reset_to_evaluation_index(driver, session_num):
+                        raise StageError("重置到评估页面失败")
+            else:
+                with self.profiler.phase('navigate', session_num):
+                    driver.switch_to.new_window('tab')
+                    handle = driver.current_window_handle
+                    self.block_unneeded_resources(driver)
+                    driver.get(self.evaluation_index_url)
+                    self.waits.settle(driver, 'navigate')
+            # 在该标签页的评估列表中找到课程并点击评估按钮
+            if self.open_and_fill_course_form(driver, course_info, session_num):
+                return handle
+            raise StageError("填写评估表单失败")
+        except Exception:
+            if handle:
+                self.close_tab(driver, handle, main_handle)
+            raise
+
+    def open_target_in_new_tab(self, driver, target):
+        """在当前标签页提交问卷请求并指定新标签页为目标，切换到新标签页并返回其句柄"""
+        handles = set(driver.window_handles)
+        driver.execute_script(OPEN_TARGET_SCRIPT, target['url'], target['method'], target['params'], '_blank')
+        new_handles = self.waits.until(driver, 'course_form', 'new_tab', lambda d: set(d.window_handles) - handles)
+        handle = new_handles.pop()
+        driver.switch_to.window(handle)
+        # 资源屏蔽对新标签页的后续加载生效
+        self.block_unneeded_resources(driver)
+        self.waits.settle(driver, 'course_form')
+        return handle
+
+    def deep_linked_form_ready(self, driver, course_info, session_num):
+        """直接打开的问卷已出现且页面上同时有课程名和教师名时返回True
+
+        否则说明按onclick生成问卷地址的映射有误；映射按站点而不是按课程生成，其他课程也会失败，
+        因此整个bot停止直接打开问卷，之后都从评估列表点击。
+        """
+        if not self.questionnaire_present(driver):
+            reason = "直接打开后没有出现问卷"
+        elif driver.execute_script(QUESTIONNAIRE_MATCHES_SCRIPT, course_info['course_name'], course_info['teacher']):
             return True
-
-        except Exception as e:
-            print(f"评估会话 {session_num} 选择满意度选项时出错: {e}")
-            return False
-
-    def verify_selections(self, driver, session_num):
-        """验证选择结果"""
-        try:
-            # 查找所有单选按钮组
-            radio_groups = driver.find_elements(By.XPATH, "//input[@type='radio']")
-            group_names = set()
-            for radio in radio_groups:
-                name = radio.get_attribute('name')
-                if name:
-                    group_names.add(name)
-
-            # 检查每个组是否有选中的选项
-            selected_count = 0
-            for name in group_names:
-                checked_radio = driver.find_elements(By.XPATH,
-                                                     f"//input[@type='radio' and @name='{name}' and @checked]")
-                if checked_radio:
-                    selected_count += 1
-                else:
-                    print(f"评估会话 {session_num}: 警告: 组 {name} 没有选中的选项")
-
-            print(f"评估会话 {session_num}: 验证: 已选中 {selected_count}/{len(group_names)} 个问题的选项")
-        except Exception as e:
-            print(f"评估会话 {session_num} 验证选择结果时出错: {e}")
-
-    def fill_evaluation_text(self, driver, session_num):
-        """填写评价文本"""
+        else:
+            reason = "直接打开的问卷不属于该课程"
+        with self.lock:
+            course_info['target'] = None
+            first_failure = self.deep_link_enabled
+            self.deep_link_enabled = False
+        if first_failure:
+            print(f"评估会话 {session_num}: 课程 {course_info['course_name']} - {course_info['teacher']} {reason}，"
+                  f"问卷地址映射可能有误，之后所有课程都从评估列表打开")
+        return False
+
+    def questionnaire_present(self, driver):
+        """当前页面是否已显示问卷的单选项"""
         try:
-            # 查找评价文本框
-            textarea = driver.find_element(By.XPATH, "//textarea[@name='zgpj']")
-            textarea.clear()
-            textarea.send_keys("老师教学认真负责，课程内容充实，受益匪浅。")
-            print(f"评估会话 {session_num}: 已填写评价文本")
+            # 问卷没有出现时会回退到列表点击，这里的超时不计为错误
+            with self.waits.tolerate_timeouts():
+                self.waits.element_present(driver, (By.CSS_SELECTOR, "input[type='radio']"), 'course_form')
             return True
-        except Exception as e:
-            print(f"评估会话 {session_num} 填写评价文本时出错: {e}")
+        except TimeoutException:
             return False
 
-    def submit_evaluation(self, driver, session_num):
-        """提交评估"""
+    def close_tab(self, driver, handle, main_handle):
+        """关闭评估标签页并切回主标签页"""
         try:
-            submit_btn = driver.find_element(By.ID, "buttonSubmit")
-            submit_btn.click()
-            print(f"评估会话 {session_num}: 已点击提交按钮")
+            driver.switch_to.window(handle)
+            driver.close()
+        except Exception:
+            pass
+        try:
+            driver.switch_to.window(main_handle)
+        except Exception:
+            pass
 
-            # 等待确认对话框出现
-            time.sleep(2)
+    def fill_questionnaire(self, driver, session_num):
+        """用一次脚本调用选择所有满意度选项、填写评价文本并校验，校验不通过时抛出StageError"""
+        # 等待评估表单加载完成
+        self.waits.element_present(driver, (By.XPATH, "//input[@type='radio']"), 'course_form')
+        self.waits.settle(driver, 'course_form')
+
+        report = driver.execute_script(FILL_QUESTIONNAIRE_SCRIPT, EVALUATION_TEXT,
+                                       self.schema_cache.all_schemas())
+        if report['total'] > 0:
+            self.schema_cache.record(report['signature'], report['choices'], report['from_cache'])
+        source = "按缓存结构" if report['from_cache'] else "按选项标签"
+        self.log(session_num, f"{source}填写，验证: 已选中 {report['selected']}/{report['total']} 个问题的选项")
+        for name in report['missing']:
+            print(f"评估会话 {session_num}: 警告: 组 {name} 没有选中的选项")
+        if not report['text_filled']:
+            raise StageError("未找到评价文本框")
+        self.log(session_num, "已填写评价文本")
+        if not (report['total'] > 0 and report['selected'] == report['total']):
+            raise StageError(f"只选中了 {report['selected']}/{report['total']} 个问题的选项")
+        return True
+
+    def submit_evaluation(self, driver, session_num, progress=None):
+        """提交评估，返回True
+
+        点击确认按钮之前出错时抛出异常，由submit阶段的retry_on决定是否重试；点击确认按钮之后服务器可能已经接受了表单，
+        再出错也不重新提交，按已提交处理，由核对阶段确认结果。progress在多次尝试间共享，记录是否已经点击过确认按钮。
+        """
+        progress = {'sent': False} if progress is None else progress
+        submit_btn = driver.find_element(By.ID, "buttonSubmit")
+        submit_btn.click()
+        self.log(session_num, "已点击提交按钮")
 
-            # 处理确认对话框
-            if self.handle_confirmation_dialog(driver, session_num):
-                # 等待提交完成
-                time.sleep(3)
-                return True
-            else:
-                return False
+        try:
+            # 处理确认对话框（内部等待对话框出现）
+            with self.profiler.phase('dialog'):
+                self.handle_confirmation_dialog(driver, session_num, progress)
+            # 等待提交请求完成
+            self.waits.settle(driver, 'submit')
         except Exception as e:
-            print(f"评估会话 {session_num} 提交评估时出错: {e}")
-            return False
-
-    def handle_confirmation_dialog(self, driver, session_num):
-        """处理确认对话框"""
+            if not progress['sent']:
+                raise
+            reason = str(e).splitlines()[0] if str(e) else type(e).__name__
+            print(f"评估会话 {session_num}: 点击确认按钮后出错（{reason}），表单可能已被接受，不再重复提交，结果由核对阶段确认")
+        return True
+
+    def handle_confirmation_dialog(self, driver, session_num, progress):
+        """处理确认对话框，点击确认按钮（或没有出现对话框）后在progress中记录表单可能已经发出"""
         try:
             # 等待对话框出现
-            wait = WebDriverWait(driver, 5)
-            dialog = wait.until(
-                EC.presence_of_element_located((By.CLASS_NAME, "layui-layer-dialog"))
-            )
-
-            # 获取对话框文本内容
-            content = dialog.find_element(By.CLASS_NAME, "layui-layer-content").text
-            print(f"评估会话 {session_num}: 对话框内容: {content}")
-
-            # 点击"是"按钮
-            confirm_btn = dialog.find_element(By.CLASS_NAME, "layui-layer-btn0")
-            confirm_btn.click()
-            print(f"评估会话 {session_num}: 已点击确认按钮")
-
-            # 等待对话框关闭
-            time.sleep(2)
-            return True
+            dialog = self.waits.dialog_visible(driver)
         except TimeoutException:
+            progress['sent'] = True
             print(f"评估会话 {session_num}: 未找到确认对话框，可能已经自动处理")
-            return True
-        except Exception as e:
-            print(f"评估会话 {session_num} 处理确认对话框时出错: {e}")
-            return False
+            return
+
+        # 获取对话框文本内容
+        content = dialog.find_element(By.CLASS_NAME, "layui-layer-content").text
+        self.log(session_num, f"对话框内容: {content}")
+
+        # 点击"是"按钮；点击本身出错时也无法确定表单是否已经发出，之后不再重新提交
+        confirm_btn = dialog.find_element(By.CLASS_NAME, "layui-layer-btn0")
+        progress['sent'] = True
+        confirm_btn.click()
+        self.log(session_num, "已点击确认按钮")
+
+        # 等待对话框关闭
+        try:
+            self.waits.dialog_gone(driver)
+        except TimeoutException:
+            print(f"评估会话 {session_num}: 确认对话框未在超时内关闭")
+
+    def results_verified(self):
+        """是否已用重新加载的评估列表核对过结果"""
+        return any(course.get('verified') for course in self.course_dict.values())
+
+    def count_evaluated(self):
+        """核对过评估列表时返回服务器确认已评估的课程数，否则返回提交成功的课程数"""
+        key = 'confirmed' if self.results_verified() else 'evaluated'
+        return sum(1 for course in self.course_dict.values() if course[key])
 
     def print_evaluation_summary(self):
-        """打印评估总结"""
-        evaluated_count = sum(1 for course in self.course_dict.values() if course['evaluated'])
+        """打印评估总结；核对过评估列表时只把服务器确认的课程计为已评估"""
         total_courses = len(self.course_dict)
-        print(f"\n评估完成! 总共评估了 {evaluated_count}/{total_courses} 门课程")
+        verified = self.results_verified()
+        if verified:
+            print(f"\n评估完成! 服务器确认已评估 {self.count_evaluated()}/{total_courses} 门课程")
+        else:
+            print(f"\n评估完成! 总共评估了 {self.count_evaluated()}/{total_courses} 门课程")
         print("\n评估总结:")
         for course_key, course_info in self.course_dict.items():
-            status = "✓ 已评估" if course_info['evaluated'] else "✗ 未评估"
+            if course_info['confirmed'] or (course_info['evaluated'] and not verified):
+                status = "✓ 已评估"
+            elif course_info['evaluated']:
+                status = "? 已提交，未经确认"
+            elif course_info['abandoned']:
+                status = "✗ 多次提交未生效，已放弃"
+            else:
+                status = "✗ 未评估"
             print(
                 f"{course_info['index']:>2}. {course_info['course_name']:<20} - {course_info['teacher']:<10} [{status}]")
+        self.waits.print_summary()
+        self.retry.print_summary()
+        cache = self.schema_cache
+        if cache.hits or cache.learned:
+            print(f"\n问卷结构缓存: 命中 {cache.hits} 次, 识别并写入 {cache.learned} 次")
+        if self.http_engine:
+            session = self.http_engine.session
+            print(f"\nHTTP统计: 请求 {session.request_count} 次, 接收 {session.bytes_received / 1024:.1f} KB")
+        pool = self.driver_pool
+        if pool.hits or pool.misses:
+            print(f"\n驱动池统计: 命中 {pool.hits} 次, 未命中 {pool.misses} 次, 回收 {pool.recycled} 次")
+        print(f"会话统计: 登录页提交 {self.login_count} 次, 共享会话成功 {self.shared_session_hits} 次, "
+              f"回退登录 {self.shared_session_fallbacks} 次")
+        if self.deep_link_hits or self.deep_link_fallbacks:
+            print(f"直接打开问卷: 成功 {self.deep_link_hits} 次, 回退到评估列表 {self.deep_link_fallbacks} 次")
+        if self.memory_governor and self.owns_memory_governor:
+            self.memory_governor.print_summary()
+        if self.launch_policy:
+            self.launch_policy.print_summary()
+        self.profiler.print_summary()
 
     def close_all_sessions(self):
         """关闭所有会话"""
         print("\n正在关闭所有会话...")
 
-        # 关闭线程池
-        self.thread_pool.shutdown(wait=True)
+        # 中断时先关闭所有浏览器，让卡在页面等待中的线程立即出错退出，再关闭线程池
+        cancelled = self.cancel_event.is_set()
+        if cancelled:
+            self.registry.quit_all()
+        shutdown_executor(self.thread_pool, cancelled)
+
+        # 关闭驱动池中的浏览器
+        self.driver_pool.close_all()
 
         # 关闭主会话
-        try:
-            self.main_driver.quit()
-        except:
-            pass
+        if self.main_driver:
+            try:
+                self.main_driver.quit()
+            except:
+                pass
+        if self.http_engine:
+            self.http_engine.close()
+        if self.memory_governor and self.owns_memory_governor:
+            self.memory_governor.stop()
+        self.profiler.close()
 
         print("所有会话已关闭")
 
-    def run(self, student_id, password):
-        """运行主流程"""
-        start_time = time.time()
+    def prepare(self, student_id, password, prewarm=True):
+        """登录并解析课程表格，成功返回True
+
+        prewarm为True时（多浏览器模式）在主会话登录的同时在后台启动评估浏览器。
+        """
         self.student_id = student_id
         self.password = password
 
+        if prewarm and not self.http_engine and self.config['engine'] == 'process':
+            self.main_session_failed = False
+            self.main_session_ready.clear()
+            self.driver_pool.warm_up(self.warm_up_limit(self.config['pool_warmup']), wait=False)
+        prepared = False
         try:
-            # 1. 主会话登录
-            if not self.login_main():
-                print("主会话登录失败，程序退出")
-                return
-
-            # 2. 主会话导航到评估页面
-            if not self.navigate_to_evaluation_main():
-                print("主会话导航到评估页面失败")
-                return
+            prepared = self.prepare_main_session()
+            return prepared
+        finally:
+            # 主会话失败时先置位中止标志，等待中的预热浏览器随即关闭，不再逐个尝试密码登录
+            if not prepared:
+                self.main_session_failed = True
+            self.main_session_ready.set()
+
+    def prepare_main_session(self):
+        """主会话登录、导航并解析课程表格，成功返回True"""
+        profiler = self.profiler
+        if self.http_engine:
+            # 1. HTTP登录
+            with profiler.phase('login', '主会话'):
+                logged_in = self.login_main_session(self.http_engine.login)
+            if not logged_in:
+                print("HTTP登录失败，程序退出")
+                return False
 
-            # 3. 解析课程表格
-            if not self.parse_course_table():
+            # 2-3. 获取并解析课程表格
+            with profiler.phase('navigate', '主会话'):
+                parsed = self.http_engine.parse_course_table()
+            if not parsed:
                 print("解析课程表格失败")
+                return False
+            self.reconcile_checkpoint()
+            return True
+
+        # 1. 主会话登录
+        with profiler.phase('login', '主会话'):
+            logged_in = self.login_main_session(self.login_main)
+        if not logged_in:
+            print("主会话登录失败，程序退出")
+            return False
+
+        # 2. 主会话导航到评估页面
+        with profiler.phase('navigate', '主会话'):
+            navigated = self.navigate_to_evaluation_main()
+        if not navigated:
+            print("主会话导航到评估页面失败")
+            return False
+
+        # 导出已认证的Cookie供评估会话共享，提前预热的浏览器随即开始登录
+        if self.config['share_session']:
+            self.export_shared_cookies()
+        self.main_session_ready.set()
+
+        # 3. 解析课程表格
+        with profiler.phase('locate', '主会话'):
+            parsed = self.parse_course_table()
+        if not parsed:
+            print("解析课程表格失败")
+            return False
+        self.reconcile_checkpoint()
+        return True
+
+    def reconcile_checkpoint(self):
+        """用刚解析的课程表格核对评估进度检查点，评估列表仍显示未评估的课程重新评估，填写次数用完的除外"""
+        unconfirmed = self.checkpoint.reconcile(self.student_id, list(self.course_dict.values()))
+        for course_info in unconfirmed:
+            print(f"检查点显示课程 {course_info['course_name']} - {course_info['teacher']} 已提交，"
+                  f"但评估列表仍显示未评估，重新评估")
+        for course_info in self.course_dict.values():
+            if course_info['status'] == '否':
+                self.check_attempts(course_info)
+
+    def check_attempts(self, course_info):
+        """课程在检查点中的填写次数达到max_course_attempts时标记为放弃并返回False"""
+        limit = self.config['max_course_attempts']
+        attempts = self.checkpoint.attempts(self.student_id, course_info)
+        if limit is None or attempts < limit:
+            return True
+        course_info['abandoned'] = True
+        print(f"课程 {course_info['course_name']} - {course_info['teacher']} 已填写提交 {attempts} 次仍未生效，"
+              f"不再评估，请手动检查")
+        return False
+
+    def run(self, student_id, password):
+        """运行主流程"""
+        start_time = time.time()
+
+        try:
+            # 1-3. 登录并解析课程表格
+            if not self.prepare(student_id, password):
                 return
 
             # 4. 独立计时的并行评估
@@ -536,16 +3462,205 @@ class TeachingEvaluationBot:
             self.close_all_sessions()
 
 
+def load_accounts(path):
+    """读取批量模式的账号文件：每行"学号,密码"（也可用空格或制表符分隔），#开头的行为注释"""
+    accounts = []
+    with open(path, encoding='utf-8-sig') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = re.split(r'[,，\s]+', line, maxsplit=1)
+            if len(fields) != 2:
+                print(f"账号文件第 {line_number} 行格式错误，已跳过")
+                continue
+            accounts.append((fields[0], fields[1]))
+    return accounts
+
+
+class BatchEvaluationRunner:
+    """批量模式：多个账号共用一个调度器
+
+    同时进行的课程总数和评估浏览器总数不超过batch_max_sessions，各账号轮流启动课程；最多batch_max_accounts个账号
+    同时登录，一个账号结束后立即关闭其会话并让下一个账号登录。每个账号有独立的机器人实例、
+    课程字典和评估总结，只共用问卷结构缓存和评估进度检查点。
+    """
+
+    def __init__(self, accounts, config=None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.waiting = collections.deque(accounts)  # 尚未登录的账号: (学号, 密码)
+        self.results = {}  # 学号 -> {'evaluated': ..., 'total': ..., 'status': ...}
+        self.bots = {}  # 学号 -> 该账号的机器人实例，结束后保留用于查看统计
+        self.lock = threading.Lock()
+        self.schema_cache = QuestionnaireSchemaCache(self.config['schema_cache_path'])
+        self.checkpoint = EvaluationCheckpoint(self.config['checkpoint_path'])
+        budget = self.config['batch_max_sessions']
+        self.executor = ThreadPoolExecutor(max_workers=budget)
+        self.policy = make_launch_policy(self.config, budget)
+        self.registry = DRIVER_REGISTRY
+        self.registry.install_handlers()
+        if self.config['sweep_stale_drivers']:
+            self.registry.sweep_stale()
+        self.scheduler = EvaluationScheduler(self.executor, self.policy, self.config['fill_wait_seconds'],
+                                             cancel_event=self.registry.cancel_event)
+        self.memory_governor = make_memory_governor(self.config)
+        if self.memory_governor:
+            self.scheduler.admission = self.memory_governor.admit
+        self.progress = make_progress_reporter(self.config)
+        self.scheduler.progress = self.progress
+
+    def run(self):
+        """登录并评估所有账号，返回每个账号的结果"""
+        start_time = time.time()
+        total_accounts = len(self.waiting)
+        print(f"批量模式: 共 {total_accounts} 个账号，最多同时 {self.config['batch_max_accounts']} 个账号、"
+              f"{self.config['batch_max_sessions']} 个评估会话")
+        if self.memory_governor:
+            self.memory_governor.start()
+        if self.progress:
+            self.progress.start()
+        for _ in range(min(self.config['batch_max_accounts'], total_accounts)):
+            self.admit_next_account()
+        try:
+            self.scheduler.run_until_done()
+        finally:
+            shutdown_executor(self.executor, self.registry.cancel_event.is_set())
+            if self.memory_governor:
+                self.memory_governor.stop()
+            if self.progress:
+                self.progress.stop()
+        self.print_batch_summary(time.time() - start_time)
+        return self.results
+
+    def admit_next_account(self):
+        """让下一个等待中的账号开始登录"""
+        with self.lock:
+            if not self.waiting:
+                return
+            student_id, password = self.waiting.popleft()
+        self.scheduler.schedule(time.time(), self.start_account, student_id, password)
+
+    def start_account(self, student_id, password):
+        """登录账号并把其课程加入调度器"""
+        print(f"\n账号 {student_id}: 开始登录")
+        bot = None
+        try:
+            bot = TeachingEvaluationBot(self.config, schema_cache=self.schema_cache, checkpoint=self.checkpoint,
+                                        memory_governor=self.memory_governor)
+            bot.waits.on_timeout = self.policy.record_timeout
+            if self.progress:
+                bot.profiler.on_phase = self.progress.publish
+                bot.progress = self.progress
+            with self.lock:
+                self.bots[student_id] = bot
+            if bot.prepare(student_id, password, prewarm=False):
+                courses = bot.courses_to_evaluate()
+                print(f"账号 {student_id}: 需要评估的课程数量: {len(courses)}")
+                open_form, submit_form, executor, max_in_flight = bot.plan_evaluation(courses, warm_up=False)
+
+                def open_with_budget(course_info, session_num):
+                    self.reclaim_idle_browsers(bot)
+                    return open_form(course_info, session_num)
+
+                self.queue_courses(student_id, bot, courses, (open_with_budget, submit_form, executor, max_in_flight))
+                return
+            self.finish_account(student_id, bot, None, status="登录失败")
+        except Exception as e:
+            print(f"账号 {student_id} 运行出错: {e}")
+            self.finish_account(student_id, bot, None, status="出错")
+
+    def reclaim_idle_browsers(self, bot):
+        """账号没有空闲浏览器、需要新建时，关闭其他账号的空闲浏览器，使评估浏览器总数不超过batch_max_sessions
+
+        进行中的课程各占一个浏览器且总数不超过上限，因此只需保证进行中的课程数加上其他账号的空闲浏览器数不超过上限。
+        """
+        if bot.config['engine'] != 'process' or bot.driver_pool.idle_count():
+            return
+        with self.lock:
+            others = [other for other in self.bots.values() if other is not bot]
+        surplus = (self.scheduler.in_flight + sum(other.driver_pool.idle_count() for other in others)
+                   - self.config['batch_max_sessions'])
+        for other in others:
+            if surplus <= 0:
+                break
+            closed = other.driver_pool.close_idle(surplus)
+            if closed:
+                print(f"评估浏览器已达上限，关闭账号 {other.student_id} 的 {closed} 个空闲浏览器")
+            surplus -= closed
+
+    def queue_courses(self, student_id, bot, courses, plan, round_number=0, first_session=1):
+        """把账号的课程加入调度器，全部结束后核对结果"""
+        open_form, submit_form, executor, max_in_flight = plan
+        self.scheduler.add(courses, open_form, submit_form, account=student_id, executor=executor,
+                           max_in_flight=max_in_flight, first_session=first_session,
+                           on_done=lambda: self.verify_account(student_id, bot, plan, round_number,
+                                                               first_session + len(courses)))
+
+    def verify_account(self, student_id, bot, plan, round_number, next_session):
+        """核对账号的评估结果，提交未生效的课程重新加入调度器，否则结束该账号"""
+        try:
+            if self.config['verify_after_run'] and not self.registry.cancel_event.is_set():
+                mismatched = bot.verify_results()
+                if mismatched and round_number < self.config['verify_requeue_rounds']:
+                    print(f"\n账号 {student_id}: 重新评估 {len(mismatched)} 门提交未生效的课程（第 {round_number + 1} 轮）")
+                    self.queue_courses(student_id, bot, mismatched, plan, round_number + 1, next_session)
+                    return
+        except Exception as e:
+            print(f"账号 {student_id} 核对评估结果时出错: {e}")
+        self.finish_account(student_id, bot, plan[2])
+
+    def finish_account(self, student_id, bot, executor, status="完成"):
+        """记录账号结果，关闭其会话并让下一个账号登录"""
+        try:
+            if bot:
+                if bot.course_dict:
+                    bot.print_evaluation_summary()
+                bot.close_all_sessions()
+            if executor:
+                # 在该线程池自己的线程中调用，不能等待
+                executor.shutdown(wait=False)
+        finally:
+            courses = bot.course_dict.values() if bot else []
+            with self.lock:
+                self.results[student_id] = {
+                    'evaluated': bot.count_evaluated() if bot else 0,
+                    'total': len(courses),
+                    'status': status,
+                }
+            self.admit_next_account()
+
+    def print_batch_summary(self, run_time):
+        """打印所有账号的评估结果"""
+        print(f"\n批量评估完成，总运行时间: {run_time:.2f} 秒")
+        print("-" * 50)
+        print(f"{'学号':<16} {'已评估':>8} {'状态':<8}")
+        print("-" * 50)
+        for student_id, result in self.results.items():
+            print(f"{student_id:<16} {result['evaluated']:>3}/{result['total']:<4} {result['status']:<8}")
+        print("-" * 50)
+        self.policy.print_summary()
+        if self.memory_governor:
+            self.memory_governor.print_summary()
+
+
 # 使用示例
 if __name__ == "__main__":
     # 在这里输入你的学号和密码
     STUDENT_ID = ""  # 请替换为你的学号
     PASSWORD = ""  # 请替换为你的密码
-
-    if not STUDENT_ID or not PASSWORD:
-        print("请先在代码内填写你的学号和密码")
-    else:
-        bot = TeachingEvaluationBot()
-        bot.run(STUDENT_ID, PASSWORD)
+    # 批量模式：填写账号文件路径后依次评估文件中的所有账号，每行"学号,密码"
+    ACCOUNTS_FILE = ""
+
+    try:
+        if ACCOUNTS_FILE:
+            BatchEvaluationRunner(load_accounts(ACCOUNTS_FILE)).run()
+        elif not STUDENT_ID or not PASSWORD:
+            print("请先在代码内填写你的学号和密码")
+        else:
+            bot = TeachingEvaluationBot()
+            bot.run(STUDENT_ID, PASSWORD)
+    except KeyboardInterrupt:
+        # 浏览器已在中断处理和收尾中关闭
+        print("评估已被用户中断")
 
 
@@ -0,0 +1,413 @@
+"""本地模拟教务系统，复现脚本依赖的登录、首页菜单、评估列表、问卷、提交按钮和layui确认对话框，
+用于在不消耗真实评估的情况下测试脚本和做性能基准
+
+用法: python 模拟教务服务器.py --port 8080 --courses 5 --interval 10 --latency 0.05
+然后在脚本配置中把 base_url 设置为 http://127.0.0.1:8080
+"""
+import json
+import time
+import html
+import random
+import secrets
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 问卷选项，从最满意到最不满意
+OPTION_LABELS = ["非常满意", "满意", "一般", "不满意", "非常不满意"]
+
+# 每个页面引用的静态资源（路径 -> (内容类型, 字节数)），模拟真实页面的图片、字体、样式表和统计脚本，
+# 用于衡量精简浏览器模式节省的流量
+STATIC_ASSETS = {
+    '/static/css/main.css': ("text/css", 40 * 1024),
+    '/static/img/banner.png': ("image/png", 120 * 1024),
+    '/static/img/logo.png': ("image/png", 30 * 1024),
+    '/static/fonts/iconfont.woff2': ("font/woff2", 60 * 1024),
+    '/static/js/analytics.js': ("application/javascript", 20 * 1024),
+}
+ASSET_TAGS = ('<link rel="stylesheet" href="/static/css/main.css">'
+              '<style>@font-face{font-family:icon;src:url(/static/fonts/iconfont.woff2)}body{font-family:icon}</style>'
+              '<script src="/static/js/analytics.js"></script>')
+ASSET_BODY = '<img src="/static/img/banner.png" alt=""><img src="/static/img/logo.png" alt="">'
+
+
+class MockAcademicState:
+    """模拟教务系统的共享状态：课程、会话和已发放的问卷令牌
+
+    account_count大于1时从student_id开始生成连续学号的多个账号，密码相同，每个账号有各自的课程。
+    """
+
+    def __init__(self, course_count=5, mandatory_interval=120, question_count=10,
+                 student_id="20230001", password="123456", latency=0.0, account_count=1, failure_rate=0.0,
+                 lost_rate=0.0):
+        self.student_id = student_id
+        self.password = password
+        self.accounts = [str(int(student_id) + i) for i in range(account_count)]
+        self.mandatory_interval = mandatory_interval
+        self.question_count = question_count
+        self.latency = latency  # 每个请求额外的响应延迟（秒）
+        self.failure_rate = failure_rate  # 问卷和提交请求随机返回503的比例，用于测试重试
+        self.lost_rate = lost_rate  # 提交返回成功但没有记录的比例，用于测试提交后的核对
+        self.courses = [
+            {
+                'account': account,
+                'id': f"KC{i:03d}",
+                'name': f"模拟课程{i}",
+                'teacher_id': f"JS{i:03d}",
+                'teacher': f"教师{i}",
+                'evaluated': False,
+            }
+            for account in self.accounts
+            for i in range(1, course_count + 1)
+        ]
+        self.sessions = {}  # 已登录的JSESSIONID -> 学号
+        self.tokens = {}  # 问卷令牌 -> (学号, 课程ID, 发放时间)
+        self.lock = threading.Lock()
+
+        # 统计信息
+        self.login_posts = 0
+        self.submissions = 0
+        self.rejections = []  # 被拒绝的提交原因
+        self.injected_failures = 0  # 随机返回503的次数
+        self.lost_submissions = 0  # 返回成功但没有记录的提交次数
+        self.bytes_sent = 0  # 发送的响应体字节数
+        self.request_counts = {}  # 路径 -> 请求次数
+
+    def account_courses(self, account):
+        return [course for course in self.courses if course['account'] == account]
+
+    def find_course(self, account, course_id):
+        for course in self.courses:
+            if course['account'] == account and course['id'] == course_id:
+                return course
+        return None
+
+    def evaluated_count(self):
+        with self.lock:
+            return sum(1 for course in self.courses if course['evaluated'])
+
+
+def render_login_page(error=""):
+    """登录页"""
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>统一身份认证</title>{ASSET_TAGS}</head>
+<body>
+{ASSET_BODY}
+<form id="loginForm" action="/j_spring_security_check" method="post">
+    <p style="color:red">{html.escape(error)}</p>
+    <input type="text" id="username" name="username" value="">
+    <input type="password" id="passwordOld" name="passwordOld" value="">
+    <button type="submit" id="J-login-btn">登录</button>
+</form>
+</body></html>"""
+
+
+def render_main_page():
+    """登录后的首页，包含刷新按钮和教学评估菜单"""
+    return """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>教务系统</title>""" + ASSET_TAGS + """</head>
+<body>
+""" + ASSET_BODY + """
+<ul class="nav-list">
+    <li class="click-item" onclick="location.href='/student/teachingEvaluation/evaluation/index'">教学评估</li>
+</ul>
+<div id="page-content-template">
+    <div>
+        <div>欢迎使用教务系统</div>
+        <div>
+            <div>
+                <div>
+                    <div><a href="javascript:void(0)" onclick="location.reload()">刷新</a></div>
+                </div>
+            </div>
+        </div>
+    </div>
+</div>
+</body></html>"""
+
+
+def render_evaluation_index(state, account):
+    """评估列表页：jxpgtbody中每行一门课程，评估按钮通过evaluationForm提交课程参数"""
+    rows = []
+    for course in state.account_courses(account):
+        status = "是" if course['evaluated'] else "否"
+        onclick = (f"evaluation('{course['teacher_id']}','{course['teacher']}',"
+                   f"'{course['id']}','{course['name']}','QN001')")
+        rows.append(f"""<tr>
+    <td><button class="btn btn-xs" onclick="{html.escape(onclick)}">评估</button></td>
+    <td>课堂教学评价</td>
+    <td>{html.escape(course['teacher'])}</td>
+    <td>{html.escape(course['name'])}</td>
+    <td>{status}</td>
+</tr>""")
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>教学评估</title>{ASSET_TAGS}</head>
+<body>
+{ASSET_BODY}
+<div id="page_div">
+<table>
+    <thead><tr><th>操作</th><th>问卷名称</th><th>被评人</th><th>评估内容</th><th>是否已评估</th></tr></thead>
+    <tbody id="jxpgtbody">
+{''.join(rows)}
+    </tbody>
+</table>
+</div>
+<form id="evaluationForm" action="/student/teachingEvaluation/teachingEvaluation/evaluationPage" method="post">
+    <input type="hidden" name="evaluatedPeopleNumber" value="">
+    <input type="hidden" name="evaluatedPeople" value="">
+    <input type="hidden" name="evaluationContentNumber" value="">
+    <input type="hidden" name="evaluationContentContent" value="">
+    <input type="hidden" name="questionnaireCode" value="">
+</form>
+<script>
+function evaluation() {{
+    var form = document.getElementById('evaluationForm');
+    var inputs = form.getElementsByTagName('input');
+    for (var i = 0; i < inputs.length; i++) {{
+        inputs[i].value = arguments[i] || '';
+    }}
+    form.submit();
+}}
+</script>
+</body></html>"""
+
+
+def render_questionnaire(state, course, token):
+    """评估问卷页：每个问题一组单选项，另有主观评价文本框"""
+    questions = []
+    for q in range(1, state.question_count + 1):
+        options = "".join(
+            f"""<label><input type="radio" name="q{q:02d}" value="{chr(65 + i)}">"""
+            f"""<span class="lbl"></span><span>{label}</span></label>"""
+            for i, label in enumerate(OPTION_LABELS)
+        )
+        questions.append(f"<tr><td>{q}. 第{q}项教学评价指标</td><td>{options}</td></tr>")
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>评估问卷</title>{ASSET_TAGS}</head>
+<body>
+{ASSET_BODY}
+<h3>{html.escape(course['name'])} - {html.escape(course['teacher'])}</h3>
+<form id="saveEvaluation" action="/student/teachingEvaluation/teachingEvaluation/assessment" method="post">
+    <input type="hidden" name="tokenValue" value="{token}">
+    <input type="hidden" name="questionnaireCode" value="QN001">
+    <input type="hidden" name="evaluatedPeopleNumber" value="{course['teacher_id']}">
+    <input type="hidden" name="evaluationContentNumber" value="{course['id']}">
+    <table>
+{''.join(questions)}
+    </table>
+    <textarea name="zgpj" rows="4"></textarea>
+</form>
+<button id="buttonSubmit" type="button">提交</button>
+<div id="result"></div>
+<script>
+document.getElementById('buttonSubmit').onclick = function () {{
+    var dialog = document.createElement('div');
+    dialog.className = 'layui-layer layui-layer-dialog';
+    dialog.innerHTML = '<div class="layui-layer-content">是否确认提交评估？</div>' +
+        '<div class="layui-layer-btn"><a class="layui-layer-btn0">是</a><a class="layui-layer-btn1">否</a></div>';
+    document.body.appendChild(dialog);
+    dialog.querySelector('.layui-layer-btn1').onclick = function () {{ dialog.remove(); }};
+    dialog.querySelector('.layui-layer-btn0').onclick = function () {{
+        dialog.remove();
+        var form = document.getElementById('saveEvaluation');
+        var xhr = new XMLHttpRequest();
+        xhr.open('POST', form.action);
+        xhr.setRequestHeader('Content-Type', 'application/x-www-form-urlencoded');
+        xhr.onload = function () {{
+            var result = JSON.parse(xhr.responseText);
+            document.getElementById('result').innerText = result.result === 'ok' ? '评估成功' : result.msg;
+        }};
+        xhr.send(new URLSearchParams(new FormData(form)).toString());
+    }};
+}};
+</script>
+</body></html>"""
+
+
+class MockAcademicHandler(BaseHTTPRequestHandler):
+    """模拟教务系统的请求处理"""
+
+    protocol_version = "HTTP/1.1"  # 支持keep-alive
+    state = None  # 由make_server设置
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---- 工具方法 ----
+
+    def session_id(self):
+        for part in self.headers.get('Cookie', '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 'JSESSIONID':
+                return value
+        return None
+
+    def logged_in(self):
+        """返回当前会话登录的学号，未登录时返回None"""
+        with self.state.lock:
+            return self.state.sessions.get(self.session_id())
+
+    def read_form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        return {key: values[-1] for key, values in urllib.parse.parse_qs(body, keep_blank_values=True).items()}
+
+    def send_body(self, body, status=200, content_type="text/html; charset=utf-8", headers=None):
+        data = body if isinstance(body, bytes) else body.encode('utf-8')
+        with self.state.lock:
+            self.state.bytes_sent += len(data)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location, headers=None):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def send_json(self, payload):
+        self.send_body(json.dumps(payload, ensure_ascii=False), content_type="application/json; charset=utf-8")
+
+    def before_request(self, path):
+        """统计请求并模拟服务器延迟"""
+        with self.state.lock:
+            self.state.request_counts[path] = self.state.request_counts.get(path, 0) + 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+
+    # ---- 路由 ----
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        self.before_request(path)
+        if path in STATIC_ASSETS:
+            content_type, size = STATIC_ASSETS[path]
+            self.send_body(b"\0" * size, content_type=content_type,
+                           headers={'Cache-Control': 'max-age=3600'})
+        elif path == '/login':
+            self.send_body(render_login_page())
+        elif not self.logged_in():
+            self.redirect('/login')
+        elif path in ('/', '/index.jsp'):
+            self.send_body(render_main_page())
+        elif path == '/student/teachingEvaluation/evaluation/index':
+            account = self.logged_in()
+            with self.state.lock:
+                page = render_evaluation_index(self.state, account)
+            self.send_body(page)
+        else:
+            self.send_body("Not Found", status=404)
+
+    def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path
+        form = self.read_form()
+        self.before_request(path)
+        if path == '/j_spring_security_check':
+            self.handle_login(form)
+        elif not self.logged_in():
+            self.redirect('/login')
+        elif self.state.failure_rate and random.random() < self.state.failure_rate:
+            with self.state.lock:
+                self.state.injected_failures += 1
+            self.send_body("Service Unavailable", status=503)
+        elif path == '/student/teachingEvaluation/teachingEvaluation/evaluationPage':
+            self.handle_questionnaire(form)
+        elif path == '/student/teachingEvaluation/teachingEvaluation/assessment':
+            self.handle_assessment(form)
+        else:
+            self.send_body("Not Found", status=404)
+
+    def handle_login(self, form):
+        state = self.state
+        with state.lock:
+            state.login_posts += 1
+        account = form.get('username')
+        if account in state.accounts and form.get('passwordOld') == state.password:
+            session_id = secrets.token_hex(16)
+            with state.lock:
+                state.sessions[session_id] = account
+            self.redirect('/index.jsp', {'Set-Cookie': f"JSESSIONID={session_id}; Path=/; HttpOnly"})
+        else:
+            self.send_body(render_login_page("用户名或密码错误"))
+
+    def handle_questionnaire(self, form):
+        state = self.state
+        account = self.logged_in()
+        course = state.find_course(account, form.get('evaluationContentNumber'))
+        if not course:
+            self.send_body("课程不存在", status=404)
+            return
+        token = secrets.token_hex(8)
+        with state.lock:
+            state.tokens[token] = (account, course['id'], time.time())
+        self.send_body(render_questionnaire(state, course, token))
+
+    def handle_assessment(self, form):
+        state = self.state
+        with state.lock:
+            state.submissions += 1
+            issued = state.tokens.pop(form.get('tokenValue'), None)
+            error = None
+            if not issued:
+                error = "令牌无效或已使用"
+            elif time.time() - issued[2] < state.mandatory_interval:
+                error = "评估时间过短，请认真填写后再提交"
+            elif any(not form.get(f"q{q:02d}") for q in range(1, state.question_count + 1)):
+                error = "存在未作答的问题"
+            elif not form.get('zgpj', '').strip():
+                error = "请填写主观评价"
+            if error:
+                state.rejections.append(error)
+            elif state.lost_rate and random.random() < state.lost_rate:
+                state.lost_submissions += 1
+            else:
+                state.find_course(issued[0], issued[1])['evaluated'] = True
+        if error:
+            self.send_json({'result': 'error', 'msg': error})
+        else:
+            self.send_json({'result': 'ok'})
+
+
+def make_server(port=0, **state_options):
+    """创建模拟服务器，port为0时自动分配端口；返回(服务器, 状态)"""
+    state = MockAcademicState(**state_options)
+    handler = type('BoundMockAcademicHandler', (MockAcademicHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟教务系统")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--courses', type=int, default=5, help="课程数量")
+    parser.add_argument('--interval', type=float, default=120, help="填写到提交的强制间隔（秒）")
+    parser.add_argument('--questions', type=int, default=10, help="每份问卷的问题数")
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求额外的响应延迟（秒）")
+    parser.add_argument('--student-id', default="20230001")
+    parser.add_argument('--password', default="123456")
+    parser.add_argument('--accounts', type=int, default=1, help="账号数量，从--student-id开始连续编号")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="问卷和提交请求随机返回503的比例")
+    parser.add_argument('--lost-rate', type=float, default=0.0, help="提交返回成功但没有记录的比例")
+    args = parser.parse_args()
+
+    server, state = make_server(args.port, course_count=args.courses, mandatory_interval=args.interval,
+                            question_count=args.questions, student_id=args.student_id, password=args.password,
+                            latency=args.latency, account_count=args.accounts, failure_rate=args.failure_rate,
+                            lost_rate=args.lost_rate)
+    print(f"模拟教务系统已启动: http://127.0.0.1:{server.server_address[1]}")
+    print(f"测试账号: {', '.join(state.accounts)} / {args.password}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()